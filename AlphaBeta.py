@@ -0,0 +1,304 @@
+## A computer opponent : negamax search with alpha-beta pruning over
+## the moves of Moves.legal_moves.
+## The search deepens one ply at a time until the time budget of the
+## move runs out, and plays the best move of the deepest search that
+## could be completed.
+## Positions already searched are remembered in a transposition table
+## keyed by Board.hash, and moves are ordered so that the best ones
+## are tried first : transposition table move, killer moves, then
+## moves that get closer to the ennemy Queen.
+## The search runs on a Bitboard copy of the position, and the leaves
+## are scored by an Evaluation.Evaluator which follows the moves made
+## on that copy.
+
+import time
+
+import Bitboard
+import Evaluation
+import Moves
+
+
+WIN      = 100000
+INFINITY = 10 * WIN
+
+# Scores beyond MATE are wins found WIN - score plies away from the root
+MATE     = WIN - 1000
+
+# Flags of the transposition table entries
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def to_table(score, ply):
+    """
+    Score to store in the transposition table for a node at 'ply' : a
+    win is counted from the node, not from the root, as the same
+    position may be reached again at another ply.
+    """
+
+    if score > MATE:
+        return score + ply
+    if score < -MATE:
+        return score - ply
+
+    return score
+
+
+def from_table(score, ply):
+    """
+    Inverse of to_table : score, counted from the root, of a node at
+    'ply' found in the transposition table.
+    """
+
+    if score > MATE:
+        return score - ply
+    if score < -MATE:
+        return score + ply
+
+    return score
+
+
+class AlphaBetaPlayer():
+
+    def __init__(self, max_time=1.0, max_depth=64, table_size=1000000, weights=None):
+
+        # Time budget of a move, in seconds
+        self.max_time   = max_time
+        self.max_depth  = max_depth
+
+        # Weights of the evaluation (see Evaluation.default_weights)
+        self.weights    = weights
+        self.evaluator  = None
+
+        # Transposition table : hash -> (depth, score, flag, best move),
+        # emptied whenever it grows beyond table_size entries
+        self.table      = dict()
+        self.table_size = table_size
+
+        # Report of the last search
+        self.depth   = 0
+        self.score   = 0
+        self.nodes   = 0
+        self.elapsed = 0.0
+
+        self.deadline = 0.0
+        self.killers  = dict()
+
+        # Set by stop, from another thread, to end the search early
+        self.stopped  = False
+
+
+    def nodes_per_second(self):
+
+        if self.elapsed:
+            return self.nodes / self.elapsed
+
+        return 0.0
+
+
+    def stop(self):
+        """
+        Asks a search running in another thread to end as soon as
+        possible. best_move then returns the best move found so far.
+        """
+
+        self.stopped = True
+
+
+    def report(self):
+        return ("depth %d, score %d, %d nodes in %.2f s (%.0f nodes/s)"
+                % (self.depth, self.score, self.nodes, self.elapsed, self.nodes_per_second()))
+
+    ##############################################################
+
+    def best_move(self, board):
+        """
+        Returns the move to play on 'board', or None if the game
+        is over. The board is not modified.
+        """
+
+        start = time.perf_counter()
+
+        board = Bitboard.Bitboard.from_board(board)
+
+        self.evaluator = Evaluation.Evaluator(board, self.weights)
+
+        self.deadline = start + self.max_time
+        self.stopped  = False
+        self.nodes    = 0
+        self.depth    = 0
+        self.killers  = dict()
+
+        moves = Moves.legal_moves(board)
+
+        if not moves:
+            return None
+
+        best = moves[0]
+
+        for depth in range(1, self.max_depth + 1):
+
+            try:
+                score, move = self.search_root(board, depth, moves, best)
+
+            except SearchTimeout:
+                break
+
+            best       = move
+            self.depth = depth
+            self.score = score
+
+            # No need to look further once the game is decided
+            if abs(score) > MATE:
+                break
+
+            if time.perf_counter() > self.deadline:
+                break
+
+        self.elapsed = time.perf_counter() - start
+
+        return best
+
+
+    def search_root(self, board, depth, moves, first):
+
+        alpha = -INFINITY
+        best  = first
+
+        ordered = [first] + [m for m in moves if m != first]
+
+        for move in ordered:
+
+            board.make(move)
+            try:
+                score = -self.negamax(board, depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                board.unmake()
+
+            if score > alpha:
+                alpha, best = score, move
+
+        return alpha, best
+
+
+    def negamax(self, board, depth, alpha, beta, ply):
+
+        self.nodes += 1
+
+        if self.nodes & 63 == 0 and (self.stopped or time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+        # Game over
+
+        colour      = board.player
+        lost        = Moves.has_lost(board, colour)
+        ennemy_lost = Moves.has_lost(board, 1 - colour)
+
+        if lost or ennemy_lost:
+            if lost and ennemy_lost:
+                return 0
+            if lost:
+                return -WIN + ply
+            return WIN - ply
+
+        # Transposition table
+
+        alpha_start = alpha
+        tt_move     = None
+        entry       = self.table.get(board.hash)
+
+        if entry:
+            tt_depth, tt_score, flag, tt_move = entry
+            tt_score = from_table(tt_score, ply)
+
+            if tt_depth >= depth:
+                if flag == EXACT:
+                    return tt_score
+                if flag == LOWER:
+                    alpha = max(alpha, tt_score)
+                elif flag == UPPER:
+                    beta = min(beta, tt_score)
+
+                if alpha >= beta:
+                    return tt_score
+
+        if depth == 0:
+            return self.evaluator.evaluate()
+
+        # Search
+
+        moves = self.order_moves(board, Moves.legal_moves(board), tt_move, ply)
+
+        best_score = -INFINITY
+        best_move  = None
+
+        for move in moves:
+
+            board.make(move)
+            try:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake()
+
+            if score > best_score:
+                best_score, best_move = score, move
+
+            if score > alpha:
+                alpha = score
+
+            if alpha >= beta:
+                killers = self.killers.setdefault(ply, [])
+                if move not in killers:
+                    killers.insert(0, move)
+                    del killers[2:]
+                break
+
+        if best_score <= alpha_start:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+
+        self.table[board.hash] = (depth, to_table(best_score, ply), flag, best_move)
+
+        return best_score
+
+
+    def order_moves(self, board, moves, tt_move, ply):
+        """
+        Sorts 'moves' so that the most promising ones come first.
+        """
+
+        killers = self.killers.get(ply, [])
+        target  = board.queen_position(1 - board.player)
+
+        near_target = set()
+        if target:
+            near_target = board.occupied_adjacent_cells(target[0], target[1])
+            near_target.update(board.free_adjacent_cells(target[0], target[1]))
+
+        def priority(move):
+
+            if move == tt_move:
+                return 0
+            if move in killers:
+                return 1
+
+            symbol, from_cell, to_cell = move
+
+            if to_cell in near_target and from_cell not in near_target:
+                return 2
+            if from_cell:
+                return 3
+            return 4
+
+        return sorted(moves, key=priority)
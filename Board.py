@@ -22,31 +22,117 @@
 
 import Pieces
 
+
+## Zobrist hashing : the hash of a position is the XOR of one 64-bit
+## key per feature of the position (each piece with its cell and
+## height, the side to move, and the number of remaining pieces of
+## each type). Keys are derived from the feature itself with the
+## splitmix64 mixer, so that the board needs no fixed size and
+## hashes are the same in every process. They are cached once
+## computed.
+
+MASK_64 = (1 << 64) - 1
+
+PIECE_KEY  = 0
+PLAYER_KEY = 1
+HAND_KEY   = 2
+
+zobrist_keys = dict()
+
+
+def splitmix64(x):
+
+    x = (x + 0x9E3779B97F4A7C15) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+
+    return x ^ (x >> 31)
+
+
+def zobrist(*feature):
+    """
+    Returns the 64-bit key of a feature, given as a tuple of integers
+    whose first element is one of the *_KEY tags above.
+    """
+
+    key = zobrist_keys.get(feature)
+
+    if key is None:
+        key = 0
+
+        for v in feature:
+            key = splitmix64(key ^ (v & MASK_64))
+
+        zobrist_keys[feature] = key
+
+    return key
+
+
+## Neighbours : direction ids go around a cell clockwise, so that the
+## two cells adjacent to both a cell and its neighbour in direction k
+## are its neighbours in directions k-1 and k+1.
+
+DIRECTIONS = ("NORTH",
+              "NORTH-EAST",
+              "SOUTH-EAST",
+              "SOUTH",
+              "SOUTH-WEST",
+              "NORTH-WEST")
+
+# (di, dj) of each direction, for even and odd columns (see the
+# form of the board above)
+OFFSETS = (((-1, 0), (-1, 1), (0, 1), (1, 0), (0, -1), (-1, -1)),
+           ((-1, 0), ( 0, 1), (1, 1), (1, 0), (1, -1), ( 0, -1)))
+
+# Cell -> tuple of its six neighbours, indexed by direction id.
+# The board has no fixed size, so the table is filled the first time
+# a cell is looked at, and shared by all the boards.
+neighbour_table = dict()
+
+
 class Board():
 
     def __init__(self):
 
-        ## The game contains up to 50 pieces
-        ## Therefore, we must account for the possibility of forming
-        ## a chain of length 25 in any direction
-        ## We pre-allocate a large empty board instead of dealing with
-        ## a data structure of variable size
-        
-        self.__width   = 51
-        self.__height  = 51
+        ## Only the occupied cells are stored, in a dictionnary keyed by
+        ## the (i, j) coordinates of the cell. There is no fixed width or
+        ## height : the hive can grow in any direction, and building or
+        ## copying a board only costs as much as the pieces on it.
 
         # With the Beetle mechanic, each position can be occupied by several pieces
         # Therefore, we use lists to represent the pieces at each cell
-        self.board     = [[[] for i in range(self.__width)] for j in range(self.__height)]
-        self.center    = (26, 26)
+        self.board     = dict()
+
+        # Cells whose top piece belongs to each player. Kept up to date
+        # by add_piece and remove_piece, like the keys of self.board
+        # which are the occupied cells.
+        self.colour_cells = [set(), set()]
+
+        # Pieces on the board, by player and by symbol. Each piece also
+        # knows its own cell and height in its stack (see Pieces.Piece)
+        self.placed = [{s: [] for s in Pieces.starting_pieces},
+                       {s: [] for s in Pieces.starting_pieces}]
+
+        # Number of top pieces of each player around the cells next to
+        # the hive, and the free cells where each player may place a
+        # new piece : next to one of its own top pieces, and to no
+        # ennemy one. Both are kept up to date by add_piece and
+        # remove_piece, which only look at the changed cell and its
+        # neighbours (see update_contacts).
+        self.contacts = dict()
+        self.frontier = [set(), set()]
+
+        # Cell where the very first piece goes when no particular cell is
+        # asked for. It sits in the middle of the default BoardUI window.
+        self.center    = (9, 14)
 
         # To visualize or compute things, it might be useful to remember
         # where are the rightmost, leftmost ... pieces on the board.
-        # TODO : actually use it
+        # The bounds are empty until the first piece is placed.
         self.left      = 0
-        self.right     = 51
+        self.right     = 0
         self.top       = 0
-        self.bot       = 51
+        self.bot       = 0
 
         # Some rules need to now the current move
         self.movecount = 1
@@ -58,13 +144,91 @@ class Board():
         # Remaining pieces for both players
         self.remaining_pieces = [Pieces.starting_pieces.copy(), Pieces.starting_pieces.copy()]
 
+        # One record per move played with make, so that unmake can
+        # take it back
+        self.history = []
+
+        # Zobrist hash of the position, kept up to date by every
+        # mutation (see zobrist above)
+        self.hash = self.compute_hash()
+
+        # Objects told about every piece added to or removed from the
+        # board, through their on_add(i, j, p) and on_remove(i, j, p)
+        # methods, called once the board is up to date
+        # (see Evaluation.Evaluator).
+        self.observers = []
+
     ##############################################################
 
-    def width(self):
-        return self.__width
+    def copy(self):
+        """
+        Returns an independent copy of the board.
+        Only the occupied cells are copied, so the cost is linear
+        in the number of pieces on the board.
+        Pieces are copied too, as they hold their own location.
+        """
+
+        new = type(self).__new__(type(self))
+        new.__dict__.update(self.__dict__)
+
+        new.board            = {cell: [p.copy() for p in stack] for cell, stack in self.board.items()}
+        new.colour_cells     = [cells.copy() for cells in self.colour_cells]
+        new.contacts         = {cell: counts.copy() for cell, counts in self.contacts.items()}
+        new.frontier         = [cells.copy() for cells in self.frontier]
+        new.placed           = [{s: [] for s in Pieces.starting_pieces},
+                                {s: [] for s in Pieces.starting_pieces}]
+
+        for stack in new.board.values():
+            for p in stack:
+                new.placed[p.colour][p.symbol].append(p)
+
+        new.queens           = self.queens.copy()
+        new.remaining_pieces = [r.copy() for r in self.remaining_pieces]
+        new.history          = self.history.copy()
+        new.observers        = []
+
+        return new
+
+
+    def fill_from(self, other):
+        """
+        Puts the position of the board 'other' on this board, which
+        must be empty. Pieces are copied, bottom of the stacks first.
+        Works between any two kinds of boards (see Bitboard).
+        """
+
+        for (i, j), stack in other.board.items():
+            for p in stack:
+                self.add_piece(i, j, p.copy())
 
-    def height(self):
-        return self.__height
+        self.movecount        = other.movecount
+        self.player           = other.player
+        self.queens           = other.queens.copy()
+        self.remaining_pieces = [r.copy() for r in other.remaining_pieces]
+
+        self.hash = self.compute_hash()
+
+
+    def compute_hash(self):
+        """
+        Computes the Zobrist hash of the position from scratch.
+        self.hash should always be equal to it.
+        """
+
+        h = 0
+
+        for (i, j), stack in self.board.items():
+            for height, p in enumerate(stack):
+                h ^= zobrist(PIECE_KEY, Pieces.type_ids[p.symbol], p.colour, i, j, height)
+
+        if self.player == 1:
+            h ^= zobrist(PLAYER_KEY)
+
+        for colour in range(2):
+            for symbol, n in self.remaining_pieces[colour].items():
+                h ^= zobrist(HAND_KEY, colour, Pieces.type_ids[symbol], n)
+
+        return h
 
     ##############################################################
 
@@ -81,8 +245,8 @@ class Board():
 
     def set_bounds(self, i, j):
         """
-        This function should be called only once, when the
-        first piece is placed on the board.
+        This function is called by add_piece, when the first
+        piece is placed on the board.
         It sets the board's bounds to this position.
         """
 
@@ -93,12 +257,17 @@ class Board():
     
 
     def all_pieces_on(self, i, j):
-        return self.board[i][j] 
+        """
+        Returns the stack of pieces on the cell (i, j), from bottom
+        to top. The returned list must not be modified : use
+        add_piece and remove_piece instead.
+        """
+        return self.board.get((i, j), [])
 
     
     def piece_on(self, i, j):
 
-        P = self.all_pieces_on(i, j)
+        P = self.board.get((i, j))
 
         if P:
             return P[-1]
@@ -115,153 +284,324 @@ class Board():
         Does not update self.remaining_pieces.
         """
 
-        self.board[i][j].append(p)
+        if not self.board:
+            self.set_bounds(i, j)
+
+        stack = self.board.get((i, j))
+
+        if stack is None:
+            stack = self.board[(i, j)] = []
+            self.frontier[0].discard((i, j))
+            self.frontier[1].discard((i, j))
+            self.update_contacts(i, j, p.colour, 1)
+
+        else:
+            under = stack[-1].colour
+            self.colour_cells[under].discard((i, j))
+
+            if under != p.colour:
+                self.update_contacts(i, j, under, -1)
+                self.update_contacts(i, j, p.colour, 1)
+
+        stack.append(p)
+        self.colour_cells[p.colour].add((i, j))
+
+        p.coords = (i, j)
+        p.height = len(stack) - 1
+        self.placed[p.colour][p.symbol].append(p)
+
+        self.hash ^= zobrist(PIECE_KEY, Pieces.type_ids[p.symbol], p.colour, i, j, p.height)
 
         self.top   = min(self.top,   i)
         self.bot   = max(self.bot,   i+1)
         self.left  = min(self.left,  j)
         self.right = max(self.right, j+1)
 
+        for o in self.observers:
+            o.on_add(i, j, p)
+
 
     def remove_piece(self, i, j):
         """
         Removes a piece from the cell (i, j).
         Does not perform any legality check.
-        Does not update self.[top|bot|left|right].
+        Shrinks self.[top|bot|left|right] if the cell was on the
+        border of the hive and is now empty.
         Returns the piece that was removed. If not piece was
         on this cell, return None
         """
 
-        if self.piece_on(i, j):
-            return self.board[i][j].pop()
-        else:
+        stack = self.board.get((i, j))
+
+        if not stack:
             return None
+
+        p = stack.pop()
+        self.colour_cells[p.colour].discard((i, j))
+
+        self.hash ^= zobrist(PIECE_KEY, Pieces.type_ids[p.symbol], p.colour, i, j, p.height)
+
+        p.coords = None
+        p.height = None
+        self.placed[p.colour][p.symbol].remove(p)
+
+        if stack:
+            under = stack[-1].colour
+            self.colour_cells[under].add((i, j))
+
+            if under != p.colour:
+                self.update_contacts(i, j, p.colour, -1)
+                self.update_contacts(i, j, under, 1)
+
+        else:
+            # Empty cells are not stored
+            del self.board[(i, j)]
+
+            self.update_contacts(i, j, p.colour, -1)
+
+            counts = self.contacts.get((i, j))
+            if counts:
+                self.update_frontier((i, j), counts)
+
+            if i in (self.top, self.bot-1) or j in (self.left, self.right-1):
+                self.update_bounds()
+
+        for o in self.observers:
+            o.on_remove(i, j, p)
+
+        return p
+
+
+    def update_bounds(self):
+        """
+        Recomputes self.[top|bot|left|right] from the occupied
+        cells. Only needed when a cell on the border is emptied.
+        """
+
+        if not self.board:
+            self.top, self.bot, self.left, self.right = 0, 0, 0, 0
+            return
+
+        rows    = [i for i, j in self.board]
+        columns = [j for i, j in self.board]
+
+        self.top   = min(rows)
+        self.bot   = max(rows) + 1
+        self.left  = min(columns)
+        self.right = max(columns) + 1
         
         
     
+    ##############################################################
+
+    ## Making and unmaking moves
+
+    def make(self, move):
+        """
+        Plays 'move', a (symbol, from_cell, to_cell) tuple as returned
+        by Moves.legal_moves, and hands the turn to the other player.
+        Does not perform any legality check.
+        Pushes on self.history everything unmake needs to restore the
+        board exactly as it was.
+        """
+
+        symbol, from_cell, to_cell = move
+        colour = self.player
+
+        self.history.append((move, self.movecount, colour, self.queens[colour],
+                             self.top, self.bot, self.left, self.right))
+
+        if from_cell:
+            p = self.remove_piece(from_cell[0], from_cell[1])
+            self.add_piece(to_cell[0], to_cell[1], p)
+
+        elif to_cell:
+            remaining = self.remaining_pieces[colour][symbol]
+
+            p = Pieces.piece_classes[symbol](colour)
+            p.number = Pieces.starting_pieces[symbol] - remaining + 1
+
+            self.add_piece(to_cell[0], to_cell[1], p)
+            self.set_remaining(colour, symbol, remaining - 1)
+
+            if symbol == "Q":
+                self.queens[colour] = True
+
+        if colour == 1:
+            self.movecount += 1
+        self.player = 1 - colour
+
+        self.hash ^= zobrist(PLAYER_KEY)
+
+
+    def set_remaining(self, colour, symbol, n):
+        """
+        Sets the number of pieces of type 'symbol' the player 'colour'
+        still has to place, and updates the hash.
+        """
+
+        type_id = Pieces.type_ids[symbol]
+
+        self.hash ^= zobrist(HAND_KEY, colour, type_id, self.remaining_pieces[colour][symbol])
+        self.remaining_pieces[colour][symbol] = n
+        self.hash ^= zobrist(HAND_KEY, colour, type_id, n)
+
+
+    def unmake(self):
+        """
+        Takes back the last move played with make.
+        """
+
+        move, movecount, colour, queen, top, bot, left, right = self.history.pop()
+        symbol, from_cell, to_cell = move
+
+        if from_cell:
+            p = self.remove_piece(to_cell[0], to_cell[1])
+            self.add_piece(from_cell[0], from_cell[1], p)
+
+        elif to_cell:
+            self.remove_piece(to_cell[0], to_cell[1])
+            self.set_remaining(colour, symbol, self.remaining_pieces[colour][symbol] + 1)
+
+        self.queens[colour] = queen
+        self.movecount      = movecount
+        self.player         = colour
+
+        self.hash ^= zobrist(PLAYER_KEY)
+
+        self.top, self.bot, self.left, self.right = top, bot, left, right
+
+    ##############################################################
+
     def cells_of_colour(self, colour):
         """
         Returns a set with all the cells that 'belong' to a
         given player.
         If a beetle is on top of a stack of pieces, the cell's
         colour is the beetle's colour.
+        The set is kept up to date by the board itself : it must
+        not be modified, and should be copied if the board is
+        modified while iterating over it.
         """
 
-        cells = set()
-        
-        for i in range(self.top, self.bot):
-            for j in range(self.left, self.right):
+        return self.colour_cells[colour]
 
-                p = self.piece_on(i, j)
 
-                if p and p.colour == colour:
-                    cells.add((i, j))
-
-        return cells
 
+    def all_cells_coord(self):
+        """
+        Returns a live view of all the occupied cells.
+        As for cells_of_colour, it should be copied if the board is
+        modified while iterating over it.
+        """
 
+        return self.board.keys()
 
-    def all_cells_coord(self):
-        
-        cells = set()
+    
 
-        for i in range(0, self.height()):
-            for j in range(0, self.width()):
+    def neighbours(self, i, j):
+        """
+        Returns the tuple of the six neighbours of the square (i, j),
+        indexed by direction id (see DIRECTIONS).
+        This is the fast version of adjacent_cells, for hot paths.
+        """
 
-                p = self.piece_on(i, j)
+        cells = neighbour_table.get((i, j))
 
-                if p:
-                    cells.add((i, j))
+        if cells is None:
+            cells = tuple((i + di, j + dj) for di, dj in OFFSETS[j & 1])
+            neighbour_table[(i, j)] = cells
 
         return cells
 
-    
 
     def adjacent_cells(self, i, j):
 
         """
         Returns a dictionnary, corresponding to the neighbours of the
         square (i, j).
-        If the square is one of the 'border' square, the corresponding
-        tuple is 'None'.
+        The board has no border, so every square has its six neighbours.
         """
 
-        neighbours = dict()
+        return dict(zip(DIRECTIONS, self.neighbours(i, j)))
 
-        # South and North neighbours do not depend on (i, j)
-        neighbours["SOUTH"] = (i+1, j)
-        neighbours["NORTH"] = (i-1, j)
 
-        if j % 2 == 0:
-            neighbours["NORTH-WEST"] = (i-1, j-1)
-            neighbours["SOUTH-WEST"] = (i  , j-1)
-            neighbours["NORTH-EAST"] = (i-1, j+1)
-            neighbours["SOUTH-EAST"] = (i  , j+1)
+    def free_adjacent_cells(self, i, j):
 
-        else: # j % 2 == 1
-            neighbours["NORTH-WEST"] = (i  , j-1)
-            neighbours["SOUTH-WEST"] = (i+1, j-1)
-            neighbours["NORTH-EAST"] = (i  , j+1) 
-            neighbours["SOUTH-EAST"] = (i+1, j+1)
+        board = self.board
 
+        return {cell for cell in self.neighbours(i, j) if cell not in board}
 
-        for direction in neighbours:
-            i, j = neighbours[direction]
 
-            if (   i < 0
-                or i > self.__height
-                or j < 0
-                or j > self.__width):
+    def occupied_adjacent_cells(self, i, j):
 
-                neighbours[direction] = None
+        board = self.board
 
-        return neighbours
+        return {cell for cell in self.neighbours(i, j) if cell in board}
 
 
-    def free_adjacent_cells(self, i, j):
 
-        cells = set()
-        
-        adj = self.adjacent_cells(i, j)
-        
-        for d in adj:
-            x, y = adj[d]
-            
-            if not self.piece_on(x, y):
-                cells.add((x, y))
+    def update_contacts(self, i, j, colour, delta):
+        """
+        Adds 'delta' to the number of top pieces of 'colour' around
+        each neighbour of (i, j), and updates the frontier of both
+        players on these neighbours.
+        """
 
-        return cells
+        contacts = self.contacts
 
+        for cell in self.neighbours(i, j):
 
-    def occupied_adjacent_cells(self, i, j):
+            counts = contacts.get(cell)
 
-        cells = set()
+            if counts is None:
+                counts = contacts[cell] = [0, 0]
 
-        adj = self.adjacent_cells(i, j)
-        
-        for d in adj:
-            x, y = adj[d]
-            
-            if self.piece_on(x, y):
-                cells.add((x, y))
+            counts[colour] += delta
 
-        return cells
+            if counts[0] or counts[1]:
+                if cell not in self.board:
+                    self.update_frontier(cell, counts)
+            else:
+                # Not next to the hive anymore
+                del contacts[cell]
+                self.frontier[1-colour].discard(cell)
+                self.frontier[colour].discard(cell)
 
 
+    def update_frontier(self, cell, counts):
+        """
+        Puts the free cell 'cell' in the frontier of the players who
+        may place a piece on it, 'counts' being its contacts.
+        """
 
-    def queen_position(self, colour):
+        for colour in (0, 1):
+            if counts[colour] and not counts[1-colour]:
+                self.frontier[colour].add(cell)
+            else:
+                self.frontier[colour].discard(cell)
 
-        if not self.queens[colour]:
-            return None
 
-        for i in range(self.top, self.bot):
-            for j in range(self.left, self.right):
+    def pieces_of(self, colour, symbol):
+        """
+        Returns the list of the pieces of type 'symbol' that the
+        player 'colour' has on the board. Their location is given
+        by their 'coords' and 'height' attributes.
+        The list is kept up to date by the board : it must not be
+        modified.
+        """
 
-                pieces = self.all_pieces_on(i, j)
+        return self.placed[colour][symbol]
 
-                for p in pieces:
-                    if isinstance(p, Pieces.Queen) and p.colour == colour:
-                        return i, j
+
+    def queen_position(self, colour):
+
+        queens = self.placed[colour]["Q"]
+
+        if queens:
+            return queens[0].coords
+
+        return None
         
     
     def spawn_cells_for_colour(self, colour):
@@ -270,12 +610,20 @@ class Board():
         directly place its own pieces.
         Rule : when placed, a piece must be adjacent to at least
         another piece, and must only be adjacent to allied pieces.
+        Exceptions : the very first piece goes on self.center, and
+        the second one anywhere next to it.
+        The set is kept up to date by the board : it must not be
+        modified.
         """
 
-        allied_adjacent = cells_of_colour(colour)
-        ennemy_adjacent = cells_of_colour(1-colour)
+        if not self.board:
+            return {self.center}
+
+        # First move of the second player : ennemy pieces do not count
+        if self.movecount == 1:
+            return self.contacts.keys() - self.board.keys()
 
-        return allied_adjacent.difference(ennemy_adjacent)
+        return self.frontier[colour]
 
 
     #####################################################################
@@ -1,7 +1,14 @@
 # A class to visualize a board !
 
 import pygame, math
+import queue
+import threading
+import time
+import traceback
+
+import AlphaBeta
 import Moves
+import Notation
 import Pieces
 
 LIGHT_BLUE   = [153, 153, 255]
@@ -12,53 +19,113 @@ BROWN        = [153, 76, 30]
 LIGHT_GREY   = [200, 200, 200]
 
 
-class Cell(pygame.sprite.Sprite):
-    def __init__(self, radius=26, font=None, piece=None):
-        super().__init__()
+# Pre-rendered images, shared by all the windows. Hexagons are drawn
+# once for each (radius, font, symbol, colour, highlight), and texts
+# once for each (font, text, colour) : rendering then only has to
+# blit them.
+hexagon_cache = dict()
+text_cache    = dict()
+bar_cache     = dict()
 
-        self.piece = piece
-        self.image = pygame.Surface([2 * radius, 2 * radius])
-        self.image.fill(BROWN)
+# Vertices of the unit hexagon : trigonometry, once and for all
+HEXAGON = [(math.cos(2 * math.pi * i / 6), math.sin(2 * math.pi * i / 6)) for i in range(6)]
 
-        self.board_x = 0
-        self.board_y = 0
 
-        self.radius = radius
-        
-        self.rect  = self.image.get_rect()
-        self.font  = font
-        self.image.set_colorkey(BROWN)
+def hexagon_points(x, y, radius):
+    """
+    Vertices of the hexagon of radius 'radius' centered on (x, y).
+    """
+    return [[x + radius * dx, y + radius * dy] for dx, dy in HEXAGON]
 
-        if piece:
-            self.draw_cell(x=radius, y=radius, player_colour=piece.colour)
-            letter = self.font.render(piece.symbol, True, (0,0,0))
-            letter_rect = letter.get_rect(center=(radius, radius))
-            self.image.blit(letter, letter_rect)
+
+def hexagon_image(radius, font=None, symbol=None, colour=0, highlight=False):
+    """
+    Image of a cell : a piece of type 'symbol' and player 'colour'
+    (outlined in white if 'highlight' is set), or an empty white
+    hexagon, to show a possible move, if 'symbol' is None.
+    """
+
+    key   = (radius, font, symbol, colour, highlight)
+    image = hexagon_cache.get(key)
+
+    if image is None:
+
+        image = pygame.Surface([2 * radius, 2 * radius])
+        image.fill(BROWN)
+        image.set_colorkey(BROWN)
+
+        points = hexagon_points(radius, radius, radius)
+
+        if symbol:
+            pygame.draw.polygon(image, WHITE if highlight else BLACK, points, 3)
+            pygame.draw.polygon(image, [LIGHT_YELLOW, LIGHT_BLUE][colour], points, 0)
+
+            letter = font.render(symbol, True, BLACK)
+            image.blit(letter, letter.get_rect(center=(radius, radius)))
 
         else:
-            self.draw_cell(x=radius, y=radius, line_colour = WHITE, fill=False)
+            pygame.draw.polygon(image, WHITE, points, 3)
 
+        hexagon_cache[key] = image
 
-    def draw_cell(self, x, y, line_colour=BLACK, fill=True, fill_colour=[LIGHT_YELLOW, LIGHT_BLUE], player_colour=0):
+    return image
 
-        # Adds an hexagonal surface, centered on (x, y), of colour 'colour',
-        # and of radius 'radius', on the main window.
-        # Need to get the coordinates of the 6 points : trigonometry !
 
-        points = []
+def text_image(font, text, colour=WHITE, cache=True):
+    """
+    Rendered 'text'. Texts shown only once (reports, hints) should not
+    be cached, as the cache is never emptied.
+    """
 
-        new_x, new_y = x, y
+    if not cache:
+        return font.render(text, True, colour)
 
-        for i in range(6):
-            new_x = x + self.radius * math.cos(2 * math.pi * i / 6)
-            new_y = y + self.radius * math.sin(2 * math.pi * i / 6)
+    key   = (font, text, tuple(colour))
+    image = text_cache.get(key)
 
-            points.append([new_x, new_y])
+    if image is None:
+        image = text_cache[key] = font.render(text, True, colour)
 
-        pygame.draw.polygon(self.image, line_colour, points, 3)
+    return image
 
-        if fill:
-            pygame.draw.polygon(self.image, fill_colour[player_colour], points, 0)
+
+
+def bar_image(start, end, size=(200, 12)):
+    """
+    Progress bar, filled from pixel 'start' to pixel 'end'.
+    """
+
+    key   = (start, end, size)
+    image = bar_cache.get(key)
+
+    if image is None:
+        image = bar_cache[key] = pygame.Surface(size)
+        image.fill(LIGHT_GREY)
+        pygame.draw.rect(image, LIGHT_BLUE, [start, 0, end - start, size[1]], 0)
+        pygame.draw.rect(image, BLACK, [0, 0, size[0], size[1]], 1)
+
+    return image
+
+
+
+class Cell(pygame.sprite.Sprite):
+    def __init__(self, radius=26, font=None, piece=None, highlight=False):
+        super().__init__()
+
+        self.piece = piece
+
+        if piece:
+            self.image = hexagon_image(radius, font, piece.symbol, piece.colour, highlight)
+        else:
+            self.image = hexagon_image(radius)
+
+        self.board_x = 0
+        self.board_y = 0
+
+        self.radius = radius
+        
+        self.rect  = self.image.get_rect()
+        self.font  = font
 
 
     def draw(self, screen):
@@ -68,24 +135,34 @@ class Cell(pygame.sprite.Sprite):
 
 
 class Button(pygame.sprite.Sprite):
+
+    # Images of the buttons, by (size, font, text)
+    cache = dict()
+
     def __init__(self, size=(250, 40), font=None, text=None):
         super().__init__()
 
         self.text         = text
         self.piece_symbol = text[0] if text else None
         self.size         = size
-        self.image        = pygame.Surface(size)
-        self.image.fill(BROWN)
+        self.font         = font
 
-        self.rect  = self.image.get_rect()
-        self.font  = font
-        self.image.set_colorkey(BROWN)
+        key        = (size, font, text)
+        self.image = Button.cache.get(key)
+
+        if self.image is None:
 
-        if text:
-            self.draw_button()
-            piece_name      = self.font.render(text, True, (0,0,0))
-            piece_name_rect = piece_name.get_rect(center=(size[0] // 2, size[1] // 2))
-            self.image.blit(piece_name, piece_name_rect)
+            self.image = Button.cache[key] = pygame.Surface(size)
+            self.image.fill(BROWN)
+            self.image.set_colorkey(BROWN)
+
+            if text:
+                self.draw_button()
+                piece_name      = self.font.render(text, True, (0,0,0))
+                piece_name_rect = piece_name.get_rect(center=(size[0] // 2, size[1] // 2))
+                self.image.blit(piece_name, piece_name_rect)
+
+        self.rect  = self.image.get_rect()
 
 
     def draw_button(self, x=1, y=1, colour=LIGHT_GREY):
@@ -104,6 +181,176 @@ class Button(pygame.sprite.Sprite):
 
 #####################################################################################################
 
+# Coordinate systems : the cell (x, y) of the board is drawn around the
+# point coord_to_screen(x, y) of the window. Columns are sqrt(3) * ratio
+# apart, rows 2 * ratio apart, and odd columns are shifted down by
+# ratio : these are the centers of a grid of hexagons of radius
+# 2 * ratio / sqrt(3), with a flat top, in which the hexagons of the
+# pieces are drawn slightly smaller.
+
+def coord_to_screen(x, y, radius, offset):
+
+    # Horizontal coordinate : same formula regardless of the cell
+
+    ratio = radius + 1
+
+    new_y = math.sqrt(3) * ratio * y + ratio  # The final '+' is an offset to see the (0, 0) cell
+        
+    # Vertical coordinate : depends on the current column
+
+    new_x = 2 * ratio * x
+
+    if y % 2 == 1:
+        new_x += ratio
+
+
+    # Compute offset, in case of scrolling :
+
+    new_x += offset[0]
+    new_y += offset[1]
+
+    return new_y, new_x
+
+
+def screen_to_coord(x, y, radius, offset):
+    """
+    Inverse of coord_to_screen : returns the cell of the board whose
+    hexagon contains the point (x, y) of the window.
+    The point is converted to fractional axial coordinates (q, r) of
+    the grid of hexagons, which are rounded to the nearest hexagon,
+    then converted back to the (row, column) coordinates of the board
+    (see Board.py).
+    """
+
+    ratio = radius + 1
+    size  = 2 * ratio / math.sqrt(3)
+
+    # Position relative to the center of the cell (0, 0)
+    px = x - ratio - offset[1]
+    py = y - offset[0]
+
+    q = (2 / 3 * px) / size
+    r = (-px / 3 + math.sqrt(3) / 3 * py) / size
+
+    # Rounding in cube coordinates (q + r + s = 0) : the coordinate
+    # which moved the most is the one recomputed from the others
+    s = -q - r
+
+    rq, rr, rs = round(q), round(r), round(s)
+
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+
+    column = rq
+    row    = rr + (column >> 1)
+
+    return (row, column)
+
+#####################################################################################################
+
+# Work done away from the event loop : move generation, hints and
+# engine searches can take seconds on a large hive, during which the
+# window must keep answering. They run in a Worker thread, on a copy
+# of the board, and their results come back as RESULT_EVENT events.
+
+RESULT_EVENT = pygame.event.custom_type()
+
+# Frames per second of the event loop
+FPS = 60
+
+
+class Job():
+    """
+    A computation for the Worker : 'function' is called on a copy of
+    'board', taken when the job is created. 'progress', if given, is
+    called with the job and returns how much of it is done, between 0
+    and 1, and 'stop' asks a running job to end early.
+    """
+
+    def __init__(self, kind, function, board, progress=None, stop=None):
+
+        self.kind      = kind
+        self.function  = function
+        self.board     = board.copy()
+        self.hash      = board.hash
+
+        self.progress  = progress
+        self.stop      = stop
+
+        self.started   = None
+        self.cancelled = False
+
+
+    def cancel(self):
+        """
+        The result of a cancelled job is never posted.
+        """
+
+        self.cancelled = True
+
+        if self.stop:
+            self.stop()
+
+
+    def elapsed(self):
+
+        if self.started is None:
+            return 0.0
+
+        return time.perf_counter() - self.started
+
+
+
+class Worker(threading.Thread):
+    """
+    Runs jobs one after the other, and posts a RESULT_EVENT, with the
+    'job' and its 'result' (or the 'error' it raised), at the end of
+    each job which was not cancelled.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+
+        self.jobs = queue.Queue()
+        self.start()
+
+
+    def submit(self, job):
+
+        self.jobs.put(job)
+
+        return job
+
+
+    def run(self):
+
+        while True:
+
+            job = self.jobs.get()
+
+            if job.cancelled:
+                continue
+
+            job.started = time.perf_counter()
+
+            try:
+                event = pygame.event.Event(RESULT_EVENT, job=job, result=job.function(job.board), error=None)
+            except Exception:
+                event = pygame.event.Event(RESULT_EVENT, job=job, result=None, error=traceback.format_exc())
+
+            if not job.cancelled:
+                pygame.event.post(event)
+
+#####################################################################################################
+
+# Drawing order of the layers of the window
+LAYERS = ("pieces", "moves", "menu", "message", "status")
+
+
 class BoardUI():
     
     def __init__(self, board, radius=26, offset=[0, 0]):
@@ -118,11 +365,43 @@ class BoardUI():
         self.font     = None
         self.offset   = [0, 0]
 
-        self.cell_list = pygame.sprite.Group()
+        # Sprites of the top pieces of the board, by cell, and of every
+        # piece met so far, so that each one is only created once.
+        # Both follow the board through its events (see on_add and
+        # on_remove) : picking and drawing only read sprites.
+        self.sprites       = dict()
+        self.piece_sprites = dict()
         self.selected_cell = None
 
+        # Cell chosen with a right click, waiting for the key of the
+        # piece to place on it
+        self.placing = None
+
+        # Job running in the background, if any (see Worker)
+        self.worker = Worker()
+        self.job    = None
+
+        # Engine of the computer player, and the one giving hints
+        self.engine        = None
+        self.engine_colour = None
+        self.hint_engine   = AlphaBeta.AlphaBetaPlayer(max_time=1.0)
+
+        # Move suggested by the hint engine, while it is shown
+        self.hint = None
+
+        # What should be on screen, as (image, rect) by layer and by
+        # name, and what is on screen : update only draws the
+        # difference (see update)
+        self.layers = {layer: dict() for layer in LAYERS}
+        self.drawn  = dict()
+
         self.start_renderer()
 
+        for (x, y), stack in board.board.items():
+            self.on_add(x, y, stack[-1])
+
+        board.observers.append(self)
+
 
     ################
 
@@ -137,172 +416,321 @@ class BoardUI():
         
         pygame.display.set_caption("Hive game")
 
+        self.clock = pygame.time.Clock()
+
         self.screen.fill(BROWN)
 
         self.update()
 
 
+    def play(self, engine=None, engine_colour=None):
+        """
+        Plays a game until its end, 'engine' (if any) playing for the
+        player 'engine_colour'. Returns the winner, or None if the
+        window was closed.
+        The loop runs at FPS frames per second : anything long runs in
+        the worker thread, so that the window never freezes.
+        """
+
+        self.engine        = engine
+        self.engine_colour = engine_colour
+
+        self.render_step()
+
+        while True:
+
+            if Moves.has_lost(self.board, 0):
+                return 1
+
+            if Moves.has_lost(self.board, 1):
+                return 0
+
+            if self.engine_turn() and self.job is None:
+                self.start_job("engine", engine.best_move, progress=self.engine_progress(engine), stop=engine.stop)
+
+            for event in pygame.event.get():
+                if not self.handle_event(event):
+                    return None
+
+            self.render_status()
+            self.clock.tick(FPS)
+
+
     def manage_all_events(self):
 
         while True:
 
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.display.quit()
+                if not self.handle_event(event):
                     return
-                
-                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1: # Select or move a piece
 
-                    if self.selected_cell:
-                        
-                        self.move_piece_event(event)
-                        
-                    else:
-                        self.select_piece_event(event)
+            self.render_status()
+            self.clock.tick(FPS)
 
 
-                elif event.type == pygame.MOUSEBUTTONUP and event.button == 3: # Add a piece
+    def handle_event(self, event):
+        """
+        Reacts to one event. Returns False once the window is closed.
+        """
 
-                    self.place_piece_event(event)
-                    
-                    
+        if event.type == pygame.QUIT:
+            self.cancel_job()
+            pygame.display.quit()
+            return False
+
+        elif event.type == pygame.VIDEORESIZE:
+            self.redraw()
+
+        elif event.type == RESULT_EVENT:
+            self.result_event(event)
+
+        elif self.engine_turn():
+            # The computer is thinking : the player has to wait
+            pass
+
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1: # Select or move a piece
+
+            self.placing = None
+
+            if self.hint:
+
+                self.hint_move_event(event)
+
+            elif self.selected_cell:
+
+                self.move_piece_event(event)
+
+            else:
+                self.select_piece_event(event)
+
+
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 3: # Add a piece
+
+            self.place_piece_event(event)
+
+        elif event.type == pygame.KEYDOWN:
+
+            if self.placing:
+                self.key_piece_event(event)
+
+            elif event.key == ord("h"):
+                self.hint_event(event)
+
+        return True
+
+
+    def engine_turn(self):
+        return self.engine is not None and self.board.player == self.engine_colour
+
+    ################
+
+    # Background jobs
+
+    def start_job(self, kind, function, progress=None, stop=None):
+        """
+        Runs function(copy of the board) in the worker thread, instead
+        of the job already running, if any.
+        """
+
+        self.cancel_job()
+
+        self.job = self.worker.submit(Job(kind, function, self.board, progress, stop))
+
+
+    def cancel_job(self):
+
+        if self.job:
+            self.job.cancel()
+            self.job = None
+
+        self.layers["status"].clear()
+
+
+    @staticmethod
+    def engine_progress(engine):
+
+        def progress(job):
+            return job.elapsed() / engine.max_time
+
+        return progress
+
+
+    def result_event(self, event):
+
+        job = event.job
+
+        # Cancelled
+        if job is not self.job:
+            return
+
+        self.cancel_job()
+
+        # The board changed in the meantime
+        if job.hash != self.board.hash:
+            self.update()
+            return
+
+        if event.error:
+            # The same search would fail again : the computer stops
+            # playing, and the error is shown once
+            if job.kind == "engine":
+                self.engine = None
+            self.render_report("Computer stopped : " + event.error.strip().splitlines()[-1])
+            return
+
+        if job.kind == "moves":
+            self.render_moves(event.result)
+
+        elif job.kind == "engine":
+            self.board.make(event.result)
+            self.render_report("Computer : " + self.engine.report())
+            self.render_step()
+
+        elif job.kind == "hint":
+            self.render_hint(event.result)
+
+    ################
+
+    # Player actions
 
     def move_piece_event(self, event):
         x, y      = event.pos
         to_cell   = self.screen_to_coord(x, y)
         from_cell = (self.selected_cell.board_x, self.selected_cell.board_y)
 
-        Moves.play_legal_move(self.board, from_cell, to_cell)
+        # Clicking before the moves of the piece are known cancels the
+        # selection. Otherwise, they are already in the move cache. Any
+        # other job (a hint) is about the position before the move.
+        pending = self.job
+        self.cancel_job()
+
+        if not (pending and pending.kind == "moves"):
+            Moves.play_legal_move(self.board, from_cell, to_cell)
         
         self.selected_cell = None
         self.render_step()
         
 
     def select_piece_event(self, event):
-        for cell in self.cell_list:
-            
-            if cell.rect.collidepoint(event.pos):
+
+        cell = self.sprites.get(self.screen_to_coord(*event.pos))
+
+        if cell:
                                 
-                x, y = cell.board_x, cell.board_y
+            x, y = cell.board_x, cell.board_y
 
-                piece = self.board.piece_on(x, y)
+            piece = cell.piece
 
-                if piece.colour == self.board.player:
-                    self.selected_cell = cell
-                    if self.board.queens[piece.colour]:
-                        moves = Moves.moves_piece(self.board, x, y)
-                        self.render_moves(moves)
-                
-                break
+            if piece.colour == self.board.player:
+                self.selected_cell = cell
+                self.render_pieces()
+                if self.board.queens[piece.colour]:
+                    self.start_job("moves", lambda board: Moves.cached_moves_piece(board, x, y))
             
 
     def place_piece_event(self, event):
 
         pos_x, pos_y = event.pos
-        
-        x, y = self.screen_to_coord(pos_x, pos_y)
+
+        # The piece is given by the next key (see key_piece_event)
+        self.placing = self.screen_to_coord(pos_x, pos_y)
+
+
+    def key_piece_event(self, event):
+
+        x, y   = self.placing
         colour = self.board.player
-                    
-        new_event = pygame.event.wait()
 
-        if new_event.type == pygame.KEYDOWN:
-            key   = new_event.key
-            piece = None
+        self.placing = None
+
+        key   = event.key
+        piece = None
 
-            if key == ord("a"):
-                piece = Pieces.Ant(colour)
+        if key == ord("a"):
+            piece = Pieces.Ant(colour)
 
-            elif key == ord("q"):
-                piece = Pieces.Queen(colour)
+        elif key == ord("q"):
+            piece = Pieces.Queen(colour)
 
-            elif key == ord("b"):
-                piece = Pieces.Beetle(colour)
+        elif key == ord("b"):
+            piece = Pieces.Beetle(colour)
 
-            elif key == ord("g"):
-                piece = Pieces.Grasshopper(colour)
+        elif key == ord("g"):
+            piece = Pieces.Grasshopper(colour)
 
-            elif key == ord("s"):
-                piece = Pieces.Spider(colour)
-                        
-            if piece:
-                Moves.place_piece(self.board, x, y, piece)
-                self.render_step()
+        elif key == ord("s"):
+            piece = Pieces.Spider(colour)
+                    
+        if piece:
+            self.cancel_job()
+            self.selected_cell = None
+            self.hint          = None
+            Moves.place_piece(self.board, x, y, piece)
+            self.render_step()
 
 
-    def wait_for_move(self):
+    def hint_move_event(self, event):
+        """
+        Clicking on the destination of the hint plays it, as it came
+        from the hint job : nothing has to be generated again. Clicking
+        anywhere else dismisses the hint.
+        """
 
-        while True:
+        move, self.hint = self.hint, None
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.display.quit()
-                    return
-                
-                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1: # Select or move a piece
+        self.cancel_job()
+        self.selected_cell = None
 
-                    if self.selected_cell:
-                        
-                        self.move_piece_event(event)
-                        
-                    else:
-                        self.select_piece_event(event)
+        if self.screen_to_coord(*event.pos) == move[2]:
+            self.board.make(move)
 
-                    return
+        self.render_step()
 
 
-                elif event.type == pygame.MOUSEBUTTONUP and event.button == 3: # Add a piece
+    def hint_event(self, event):
 
-                    self.place_piece_event(event)
-                    return
+        engine = self.hint_engine
 
-                    
+        self.start_job("hint", engine.best_move, progress=self.engine_progress(engine), stop=engine.stop)
 
 
     ###################################
 
-    # Useful technical functions to deal with the coordinate systems
+    # Board events : keep the sprites in sync with the board
 
-    def coord_to_screen(self, x, y):
+    def on_add(self, x, y, p):
 
-        # Horizontal coordinate : same formula regardless of the cell
+        cell = self.piece_sprites.get(p)
 
-        ratio  = self.radius + 1
-        offset = self.offset
-
-        new_y = math.sqrt(3) * ratio * y + ratio  # The final '+' is an offset to see the (0, 0) cell
-        
-        # Vertical coordinate : depends on the current column
+        if cell is None:
+            cell = self.piece_sprites[p] = Cell(radius=self.radius, font=self.font, piece=p)
 
-        new_x = 2 * ratio * x
+        cell.board_x = x
+        cell.board_y = y
+        cell.rect.center = self.coord_to_screen(x, y)
 
-        if y % 2 == 1:
-            new_x += ratio
+        self.sprites[(x, y)] = cell
 
 
-        # Compute offset, in case of scrolling :
+    def on_remove(self, x, y, p):
 
-        new_x += offset[0]
-        new_y += offset[1]
+        self.sprites.pop((x, y), None)
 
-        return new_y, new_x
+        # A piece covered by a Beetle shows up again
+        under = self.board.piece_on(x, y)
+        if under:
+            self.on_add(x, y, under)
 
+    ###################################
 
-    def screen_to_coord(self, x, y):
-        # Inverse operation : gets a (x, y) point on screen, return the corresponding
-        # board cell coordinates
-        # TODO : CLEVER THINGS !
+    # Useful technical functions to deal with the coordinate systems
 
-        radius, offset = self.radius + 1, self.offset
+    def coord_to_screen(self, x, y):
+        return coord_to_screen(x, y, self.radius, self.offset)
 
-        for i in range(0, self.board.height()):
-            for j in range(0, self.board.width()):
 
-                virtual_cell = Cell()
-                v_y, v_x = self.coord_to_screen(i, j)
-                virtual_cell.rect.center = (v_y, v_x)
-                
-                if virtual_cell.rect.collidepoint(x, y):
-                    return (i, j)
+    def screen_to_coord(self, x, y):
+        return screen_to_coord(x, y, self.radius, self.offset)
 
 
     #################################
@@ -316,16 +744,7 @@ class BoardUI():
         # and of radius 'radius', on the main window.
         # Need to get the coordinates of the 6 points : trigonometry !
 
-        points = []
-        radius = self.radius
-
-        new_x, new_y = x, y
-
-        for i in range(6):
-            new_x = x + radius * math.cos(2 * math.pi * i / 6)
-            new_y = y + radius * math.sin(2 * math.pi * i / 6)
-
-            points.append([new_x, new_y])
+        points = hexagon_points(x, y, self.radius)
 
         pygame.draw.polygon(self.screen, line_colour, points, 3)
 
@@ -344,36 +763,24 @@ class BoardUI():
 
         self.draw_hexagon_(new_y, new_x, player_colour=p.colour)
         
-        letter = self.font.render(p.symbol, True, (0,0,0))
+        letter = text_image(self.font, p.symbol, BLACK)
         letter_rect = letter.get_rect(center=(new_y, new_x))
         self.screen.blit(letter, letter_rect)
 
 
         
 
-    def get_cells_sprite(self):
-
-        for x in range(self.board.top, self.board.bot):
-            for y in range(self.board.left, self.board.right):
-
-                p = self.board.piece_on(x, y)
+    def render_moves(self, moves, line_colour=WHITE):
 
-                if p:
-                    cell = Cell(radius=self.radius, font=self.font, piece=p)
-                    self.cell_list.add(cell)
-                    
-        
+        layer = self.layers["moves"]
+        layer.clear()
 
-                    
-    def render_moves(self, moves, line_colour=WHITE):
+        image = hexagon_image(self.radius)
 
         for x, y in moves:
 
             new_y, new_x = self.coord_to_screen(x, y)
-
-            cell_move = Cell(radius=self.radius)
-            cell_move.rect.center = (new_y, new_x)
-            cell_move.draw(self.screen)
+            layer[(x, y)] = (image, image.get_rect(center=(new_y, new_x)))
 
         self.update()
         
@@ -381,27 +788,20 @@ class BoardUI():
         
     def render_pieces(self):
 
-        self.screen.fill(BROWN)
-        
-        for x in range(self.board.top, self.board.bot):
-            for y in range(self.board.left, self.board.right):
+        layer = self.layers["pieces"]
+        layer.clear()
 
-                p = self.board.piece_on(x, y)
+        # Moves shown for a previous selection are out of date
+        self.layers["moves"].clear()
 
-                if p:
+        for (x, y), cell in self.sprites.items():
 
-                    ### TODO : implement other things so sprite are added ON CREATION, not on rendering
-                    # and so they ALREADY have a correct rect.x, rect.y
-                    
-                    cell = Cell(radius=self.radius, font=self.font, piece=p)
-                    cell.board_x = x
-                    cell.board_y = y
-                    
-                    self.cell_list.add(cell)
-                    
-                    new_y, new_x = self.coord_to_screen(x, y)
-                    cell.rect.center = (new_y, new_x)
-                    cell.draw(self.screen)
+            image = cell.image
+
+            if cell is self.selected_cell:
+                image = hexagon_image(self.radius, self.font, cell.piece.symbol, cell.piece.colour, highlight=True)
+
+            layer[(x, y)] = (image, cell.rect.copy())
 
         self.update()
 
@@ -409,43 +809,34 @@ class BoardUI():
 
     def render_menu(self):
 
-        player = self.board.player
-        
-        player_colour_str  = "Player " + str(player + 1)
-        player_colour      = self.menu_font.render(player_colour_str, True, WHITE)
-        player_colour_rect = player_colour.get_rect(topleft=(50, 100))
-        self.screen.blit(player_colour, player_colour_rect)
+        layer = self.layers["menu"]
+        layer.clear()
 
-        movecount_str      = "Move number " + str(self.board.movecount)
-        movecount          = self.menu_font.render(movecount_str, True, WHITE)
-        movecount_rect     = movecount.get_rect(topleft=(50, 150))
-        self.screen.blit(movecount, movecount_rect)
+        def text(name, string, **position):
+            image = text_image(self.menu_font, string)
+            layer[name] = (image, image.get_rect(**position))
 
+        player = self.board.player
+
+        text("player",    "Player " + str(player + 1),              topleft=(50, 100))
+        text("movecount", "Move number " + str(self.board.movecount), topleft=(50, 150))
 
         pos_x = 200
         pos_y = 50
 
-        message_pieces      = self.menu_font.render("Pieces left:", True, WHITE)
-        message_pieces_rect = message_pieces.get_rect(topleft=(pos_y, pos_x))
-        self.screen.blit(message_pieces, message_pieces_rect)
+        text("pieces", "Pieces left:", topleft=(pos_y, pos_x))
         
         for p in range(2):
             remaining_pieces = self.board.remaining_pieces[p]
 
             pos_x = 230
 
-            message_pieces      = self.menu_font.render("Player " + str(p + 1), True, WHITE)
-            message_pieces_rect = message_pieces.get_rect(topleft=(pos_y, pos_x))
-            self.screen.blit(message_pieces, message_pieces_rect)
+            text(("player", p), "Player " + str(p + 1), topleft=(pos_y, pos_x))
 
             pos_x += 30
             
             for s in remaining_pieces:
-                player_pieces_str = s + " : " + str(remaining_pieces[s])
-            
-                player_pieces      = self.menu_font.render(player_pieces_str, True, WHITE)
-                player_pieces_rect = player_pieces.get_rect(topleft=(pos_y, pos_x))
-                self.screen.blit(player_pieces, player_pieces_rect)
+                text(("remaining", p, s), s + " : " + str(remaining_pieces[s]), topleft=(pos_y, pos_x))
                 pos_x += 30
 
             pos_y += 120
@@ -457,7 +848,7 @@ class BoardUI():
             
             button = Button(font=self.menu_font, text=piece_name)
             button.rect.center = (1200, pos_x)
-            button.draw(self.screen)
+            layer[("button", piece_name)] = (button.image, button.rect)
             pos_x += 60
         
         self.update()
@@ -468,10 +859,10 @@ class BoardUI():
         self.render_pieces()
         self.render_menu()
 
-        message_str         = "Player " + str(winner + 1) + " has won the game !"
-        message_colour      = self.menu_font.render(message_str, True, WHITE)
-        message_colour_rect = message_colour.get_rect(center=(self.screen.get_width() // 2, 50))
-        self.screen.blit(message_colour, message_colour_rect)
+        message_str    = "Player " + str(winner + 1) + " has won the game !"
+        message_colour = text_image(self.menu_font, message_str)
+
+        self.layers["message"]["winner"] = (message_colour, message_colour.get_rect(center=(self.screen.get_width() // 2, 50)))
 
         self.update()
 
@@ -481,5 +872,123 @@ class BoardUI():
         self.render_pieces()
         self.render_menu()
 
-    def update(self):
+
+    def render_hint(self, move):
+        """
+        Shows the move suggested to the player : its piece is selected,
+        so that clicking on the destination plays it.
+        """
+
+        if not move or move == Moves.PASS:
+            return
+
+        symbol, from_cell, to_cell = move
+
+        self.hint          = move
+        self.selected_cell = self.sprites[from_cell] if from_cell else None
+        self.render_pieces()
+        self.render_moves([to_cell])
+
+        hint = text_image(self.menu_font, "Hint : " + Notation.move_to_string(self.board, move), cache=False)
+        self.layers["moves"]["hint"] = (hint, hint.get_rect(topleft=(50, 50)))
+
+        self.update()
+
+
+    def render_report(self, string):
+        """
+        Shows what the computer last did, below the menu.
+        """
+
+        report = text_image(self.menu_font, string, cache=False)
+        self.layers["message"]["report"] = (report, report.get_rect(topleft=(50, 860)))
+
+        self.update()
+
+
+    def render_status(self):
+        """
+        Shows what the worker is doing, with a progress bar, while a
+        job runs. Short jobs are not shown, so that nothing blinks.
+        """
+
+        layer = self.layers["status"]
+        job   = self.job
+
+        if job is None or job.elapsed() < 0.1:
+            if layer:
+                layer.clear()
+                self.update()
+            return
+
+        label = {"moves"  : "Computing moves",
+                 "engine" : "Computer thinking",
+                 "hint"   : "Looking for a hint"}[job.kind]
+
+        text = text_image(self.menu_font, label)
+        layer["text"] = (text, text.get_rect(topleft=(50, 900)))
+
+        width = 200
+
+        if job.progress:
+            start, end = 0, int(width * min(job.progress(job), 1.0))
+
+        else:
+            # Unknown length : a block going back and forth
+            position   = int(job.elapsed() * 150) % (2 * (width - 40))
+            start      = min(position, 2 * (width - 40) - position)
+            end        = start + 40
+
+        bar = bar_image(start, end, (width, 12))
+        layer["bar"] = (bar, bar.get_rect(topleft=(50, 930)))
+
+        self.update()
+
+
+    def redraw(self):
+        """
+        Draws the whole window again, for instance once it has been
+        resized.
+        """
+
+        self.drawn = dict()
+        self.screen.fill(BROWN)
+        self.update()
         pygame.display.update()
+
+
+    def update(self):
+        """
+        Draws what changed in the layers since the last update, and
+        only sends these rectangles to the display : every changed
+        rectangle is cleared, then everything which overlaps it is
+        drawn again, layer after layer.
+        """
+
+        wanted = dict()
+        for layer in LAYERS:
+            for name, item in self.layers[layer].items():
+                wanted[(layer, name)] = item
+
+        dirty = [rect for key, (image, rect) in self.drawn.items() if wanted.get(key) != (image, rect)]
+        dirty.extend(rect for key, (image, rect) in wanted.items() if self.drawn.get(key) != (image, rect))
+
+        if not dirty:
+            return
+
+        items = list(wanted.values())
+        rects = [rect for image, rect in items]
+
+        for rect in dirty:
+
+            self.screen.set_clip(rect)
+            self.screen.fill(BROWN)
+
+            for k in rect.collidelistall(rects):
+                self.screen.blit(*items[k])
+
+        self.screen.set_clip(None)
+
+        self.drawn = wanted
+
+        pygame.display.update(dirty)
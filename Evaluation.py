@@ -0,0 +1,255 @@
+## Static evaluation of a position, for the search of the computer
+## opponents.
+#
+## The score is a weighted sum of features of both players. Each
+## weight is applied to the difference between the feature of the
+## player to move and the one of its ennemy :
+#
+#   queen_neighbours   occupied cells around the player's Queen
+#   top_pieces         cells whose top piece belongs to the player
+#   on_board           pieces the player has on the board
+#   pinned             top pieces which cannot move (see Moves.pinned_cells)
+#   mobility           moves of the player's pieces, if its Queen is placed
+#
+## An Evaluator follows the mutations of its board (see
+## Board.observers) to keep the first three features up to date, at
+## the cost of a few operations per added or removed piece, instead
+## of counting them again at every leaf of the search. Pinned pieces
+## and mobility depend on the whole hive, and a single move can change
+## them anywhere : they are computed when needed (mobility only if its
+## weight is not 0), and remembered by position (Board.hash), as the
+## same leaves come back through transpositions and at every depth of
+## an iterative deepening search.
+#
+## features(board) computes everything from scratch : it is the
+## reference the incremental features are checked against (see
+## Evaluator.check).
+
+import Moves
+
+
+FEATURES = ("queen_neighbours", "top_pieces", "on_board", "pinned", "mobility")
+
+# Pieces around the ennemy Queen are good, pieces around our own Queen
+# are bad, and so are pinned pieces
+default_weights = {"queen_neighbours" : -10,
+                   "top_pieces"       : 1,
+                   "on_board"         : 0,
+                   "pinned"           : -1,
+                   "mobility"         : 0}
+
+
+def merge_weights(weights):
+    """
+    Returns default_weights, updated with the weights given in
+    'weights' (if any).
+    """
+
+    merged = dict(default_weights)
+    merged.update(weights or {})
+
+    return merged
+
+
+def mobility(board, colour, pinned):
+    """
+    Number of moves of the pieces of 'colour' on 'board', 'pinned'
+    being Moves.pinned_cells(board).
+    """
+
+    if not board.queens[colour]:
+        return 0
+
+    return sum(len(Moves.moves_piece(board, i, j, pinned))
+               for i, j in board.cells_of_colour(colour))
+
+
+def features(board, with_mobility=True):
+    """
+    Computes the features of both players from scratch, as a
+    dictionnary mapping each name of FEATURES to a list [player 0,
+    player 1]. Mobility is left to 0 if 'with_mobility' is False.
+    """
+
+    result = {name: [0, 0] for name in FEATURES}
+    pinned = Moves.pinned_cells(board)
+
+    for colour in range(2):
+
+        pos = board.queen_position(colour)
+
+        if pos:
+            result["queen_neighbours"][colour] = len(board.occupied_adjacent_cells(pos[0], pos[1]))
+
+        cells = board.cells_of_colour(colour)
+
+        result["top_pieces"][colour] = len(cells)
+        result["on_board"][colour]   = sum(len(pieces) for pieces in board.placed[colour].values())
+        result["pinned"][colour]     = len(cells & pinned)
+
+        if with_mobility:
+            result["mobility"][colour] = mobility(board, colour, pinned)
+
+    return result
+
+
+def score(values, weights, colour):
+    """
+    Weighted sum of the features 'values' (see features), from the
+    point of view of 'colour'.
+    """
+
+    return sum(weight * (values[name][colour] - values[name][1-colour])
+               for name, weight in weights.items() if weight)
+
+
+def evaluate(board, weights=None):
+    """
+    Reference evaluation of 'board', from scratch, from the point of
+    view of the player to move.
+    """
+
+    weights = merge_weights(weights)
+
+    return score(features(board, weights["mobility"]), weights, board.player)
+
+
+
+class Evaluator():
+    """
+    Incremental evaluation of the position of one board. Once built,
+    it follows every piece added to or removed from the board.
+    """
+
+    def __init__(self, board, weights=None, cache_size=100000):
+
+        self.board   = board
+        self.weights = merge_weights(weights)
+
+        # Pinned pieces and mobility of both players, by position
+        self.cache      = dict()
+        self.cache_size = cache_size
+
+        self.reset()
+        board.observers.append(self)
+
+
+    def detach(self):
+        """
+        Stops following the board.
+        """
+
+        self.board.observers.remove(self)
+
+
+    def reset(self):
+        """
+        Counts the incremental features from scratch.
+        """
+
+        values = features(self.board, with_mobility=False)
+
+        self.queen_neighbours = values["queen_neighbours"]
+        self.top_pieces       = values["top_pieces"]
+        self.on_board         = values["on_board"]
+
+        # Cells around each Queen, None while it is not on the board
+        self.around_queen = [None, None]
+
+        for colour in range(2):
+            pos = self.board.queen_position(colour)
+            if pos:
+                self.around_queen[colour] = set(self.board.neighbours(pos[0], pos[1]))
+
+    ##############################################################
+
+    ## Board events
+
+    def on_add(self, i, j, p):
+
+        board = self.board
+
+        self.on_board[p.colour]   += 1
+        self.top_pieces[p.colour] += 1
+
+        if p.height:
+            # Covers another piece : the cell was already occupied
+            self.top_pieces[board.all_pieces_on(i, j)[-2].colour] -= 1
+            return
+
+        for colour in range(2):
+            if self.around_queen[colour] and (i, j) in self.around_queen[colour]:
+                self.queen_neighbours[colour] += 1
+
+        if p.symbol == "Q":
+            self.around_queen[p.colour]     = set(board.neighbours(i, j))
+            self.queen_neighbours[p.colour] = len(board.occupied_adjacent_cells(i, j))
+
+
+    def on_remove(self, i, j, p):
+
+        board = self.board
+
+        self.on_board[p.colour]   -= 1
+        self.top_pieces[p.colour] -= 1
+
+        under = board.piece_on(i, j)
+
+        if under:
+            self.top_pieces[under.colour] += 1
+            return
+
+        if p.symbol == "Q":
+            self.around_queen[p.colour]     = None
+            self.queen_neighbours[p.colour] = 0
+
+        for colour in range(2):
+            if self.around_queen[colour] and (i, j) in self.around_queen[colour]:
+                self.queen_neighbours[colour] -= 1
+
+    ##############################################################
+
+    def features(self):
+        """
+        Features of both players (see features above), the
+        incremental ones being taken from the counters.
+        """
+
+        board = self.board
+        moves = self.cache.get(board.hash)
+
+        if moves is None:
+            pinned = Moves.pinned_cells(board)
+            moves  = ([len(board.cells_of_colour(c) & pinned) for c in range(2)], [0, 0])
+
+            if self.weights["mobility"]:
+                moves = (moves[0], [mobility(board, c, pinned) for c in range(2)])
+
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+
+            self.cache[board.hash] = moves
+
+        return {"queen_neighbours" : list(self.queen_neighbours),
+                "top_pieces"       : list(self.top_pieces),
+                "on_board"         : list(self.on_board),
+                "pinned"           : list(moves[0]),
+                "mobility"         : list(moves[1])}
+
+
+    def evaluate(self):
+        """
+        Evaluation of the position, from the point of view of the
+        player to move.
+        """
+
+        return score(self.features(), self.weights, self.board.player)
+
+
+    def check(self):
+        """
+        Returns True if the incremental features are equal to the ones
+        computed from scratch.
+        """
+
+        return self.features() == features(self.board, bool(self.weights["mobility"]))
@@ -0,0 +1,193 @@
+## Features of many positions at once, as a NumPy matrix with one row
+## per position, to train or tune evaluation functions.
+#
+## The pieces of all the positions are first packed into arrays of
+## fixed size (one slot for each of the 22 pieces of a game), and
+## every feature is then computed on the whole batch at once with
+## array operations. Only the features which need the move generator
+## (mobility and pinned pieces) go through Moves, one position at a
+## time : they are the slow part.
+#
+## For each player, the columns are (see feature_names) :
+#
+#   on_board_<X>     pieces of type X on the board
+#   in_hand_<X>      pieces of type X still to be placed
+#   queen_placed     1 if the Queen is on the board
+#   liberties        free cells around the Queen (6 while it is not placed)
+#   mobility_<X>     moves of the pieces of type X
+#   pinned           pieces that cannot move without breaking the hive
+#   own_queen        mean distance of the pieces to their own Queen
+#   ennemy_queen     mean distance of the pieces to the ennemy Queen
+#
+## and a last column for the player to move. Distances are 0 while
+## the Queen is not on the board.
+
+import numpy as np
+
+import Moves
+import Pieces
+
+
+# Types, in the order of their ids (see Pieces.type_ids)
+SYMBOLS = sorted(Pieces.type_ids, key=Pieces.type_ids.get)
+
+MAX_PIECES = 2 * sum(Pieces.starting_pieces.values())
+
+
+def _names():
+
+    names = []
+
+    for colour in range(2):
+
+        columns  = ["on_board_" + s for s in SYMBOLS]
+        columns += ["in_hand_" + s for s in SYMBOLS]
+        columns += ["queen_placed", "liberties"]
+        columns += ["mobility_" + s for s in SYMBOLS]
+        columns += ["pinned", "own_queen", "ennemy_queen"]
+
+        names += ["p%d_%s" % (colour, c) for c in columns]
+
+    return names + ["player"]
+
+
+feature_names = _names()
+
+
+def pack(boards):
+    """
+    Packs the positions of 'boards' into arrays :
+    - pieces : (N, MAX_PIECES, 4) integers, the type id, colour and
+      axial coordinates (q, r) of each piece, or -1 for unused slots
+    - heights : (N, MAX_PIECES), height of each piece in its stack
+    - hands : (N, 2, 5), pieces each player still has to place
+    - players : (N,), player to move
+    """
+
+    n = len(boards)
+
+    pieces  = np.full((n, MAX_PIECES, 4), -1, dtype=np.int32)
+    heights = np.zeros((n, MAX_PIECES), dtype=np.int32)
+    hands   = np.zeros((n, 2, len(SYMBOLS)), dtype=np.int32)
+    players = np.zeros(n, dtype=np.int32)
+
+    for k, board in enumerate(boards):
+
+        rows = [(Pieces.type_ids[p.symbol], p.colour, j, i - (j >> 1), p.height)
+                for (i, j), stack in board.board.items() for p in stack]
+
+        if rows:
+            rows = np.array(rows, dtype=np.int32)
+            pieces[k, :len(rows)]  = rows[:, :4]
+            heights[k, :len(rows)] = rows[:, 4]
+
+        hands[k]   = [[r[s] for s in SYMBOLS] for r in board.remaining_pieces]
+        players[k] = board.player
+
+    return pieces, heights, hands, players
+
+
+def hex_distance(dq, dr):
+    return (np.abs(dq) + np.abs(dr) + np.abs(dq + dr)) // 2
+
+
+def move_features(board):
+    """
+    Mobility by type, and number of pinned pieces, of both players :
+    an array of shape (2, 6). These need the move generator, so they
+    are computed one position at a time.
+    """
+
+    result = np.zeros((2, len(SYMBOLS) + 1), dtype=np.int32)
+
+    pinned = Moves.pinned_cells(board)
+
+    for colour in range(2):
+
+        cells = board.cells_of_colour(colour)
+
+        result[colour, -1] = len(cells & pinned)
+
+        # No piece can move before the Queen is placed
+        if not board.queens[colour]:
+            continue
+
+        for i, j in cells:
+            symbol = board.piece_on(i, j).symbol
+            result[colour, Pieces.type_ids[symbol]] += len(Moves.moves_piece(board, i, j, pinned))
+
+    return result
+
+
+def features(boards, mobility=True):
+    """
+    Returns the features of the positions of 'boards' (any sequence
+    of Board or Bitboard), as a float32 matrix of shape
+    (len(boards), len(feature_names)).
+    With 'mobility' set to False, the mobility and pinned columns are
+    left to 0, and no move is generated.
+    """
+
+    pieces, heights, hands, players = pack(boards)
+
+    n      = len(boards)
+    types  = pieces[:, :, 0]
+    colour = pieces[:, :, 1]
+    q      = pieces[:, :, 2]
+    r      = pieces[:, :, 3]
+    used   = types >= 0
+
+    # Pieces on the board, by player and type : (N, 2, 5)
+    on_board = np.stack([np.stack([((types == t) & (colour == c)).sum(axis=1)
+                                   for t in range(len(SYMBOLS))], axis=1)
+                         for c in range(2)], axis=1)
+
+    # Location of the Queens : (N, 2), with a mask of the placed ones
+    queen_q = np.zeros((n, 2), dtype=np.int32)
+    queen_r = np.zeros((n, 2), dtype=np.int32)
+
+    is_queen = (types == Pieces.type_ids["Q"])
+    placed   = np.stack([(is_queen & (colour == c)).any(axis=1) for c in range(2)], axis=1)
+
+    for c in range(2):
+        slot          = (is_queen & (colour == c)).argmax(axis=1)
+        queen_q[:, c] = np.take_along_axis(q, slot[:, None], axis=1)[:, 0]
+        queen_r[:, c] = np.take_along_axis(r, slot[:, None], axis=1)[:, 0]
+
+    # Distance of every piece to each Queen : (N, MAX_PIECES, 2)
+    distance = hex_distance(q[:, :, None] - queen_q[:, None, :], r[:, :, None] - queen_r[:, None, :])
+
+    # Each occupied cell has exactly one piece at the bottom of its stack
+    bottom    = used & (heights == 0)
+    liberties = np.where(placed, 6 - ((distance == 1) & bottom[:, :, None]).sum(axis=1), 6)
+
+    # Mean distance of the pieces of each player to each Queen : (N, 2, 2)
+    means = np.zeros((n, 2, 2), dtype=np.float32)
+
+    for c in range(2):
+        mine  = used & (colour == c) & ~is_queen
+        count = np.maximum(mine.sum(axis=1), 1)
+
+        for target in range(2):
+            total = np.where(mine, distance[:, :, target], 0).sum(axis=1)
+            means[:, c, target] = np.where(placed[:, target], total / count, 0)
+
+    moves = np.zeros((n, 2, len(SYMBOLS) + 1), dtype=np.int32)
+
+    if mobility:
+        for k, board in enumerate(boards):
+            moves[k] = move_features(board)
+
+    # Columns, in the order of feature_names
+
+    columns = []
+
+    for c in range(2):
+        columns += [on_board[:, c], hands[:, c],
+                    placed[:, c, None], liberties[:, c, None],
+                    moves[:, c],
+                    means[:, c, c, None], means[:, c, 1 - c, None]]
+
+    columns.append(players[:, None])
+
+    return np.concatenate(columns, axis=1).astype(np.float32)
@@ -0,0 +1,271 @@
+## A computer opponent based on Monte Carlo tree search (UCT).
+## Each playout walks down the tree with the UCB1 formula, adds one
+## new node, then plays random legal moves until the game is over
+## (or too long), and propagates the result back up the tree.
+#
+## Playouts are spread over a pool of worker processes with root
+## parallelism : every worker grows its own tree from the same
+## position, with its own random seed, and the visit counts of the
+## root moves are summed at the end. Workers never have to talk to
+## each other, so the throughput scales with the number of cores.
+#
+## Random Hive games can go on for a very long time : playouts are
+## cut after 'max_plies' random moves, and then adjudicated by
+## looking at how surrounded each Queen is.
+
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import Bitboard
+import Moves
+
+
+def outcome(board):
+    """
+    Returns None if the game is not over on 'board'. Otherwise,
+    returns the score of player 0 : 1 for a win, 0 for a loss,
+    0.5 for a draw (both Queens surrounded at once).
+    """
+
+    lost = (Moves.has_lost(board, 0), Moves.has_lost(board, 1))
+
+    if not any(lost):
+        return None
+
+    if all(lost):
+        return 0.5
+
+    return 0.0 if lost[0] else 1.0
+
+
+def adjudicate(board):
+    """
+    Score of player 0 when a playout is cut short : the player whose
+    Queen has fewer neighbours is considered the winner.
+    """
+
+    surrounded = []
+
+    for colour in range(2):
+        pos = board.queen_position(colour)
+        surrounded.append(len(board.occupied_adjacent_cells(pos[0], pos[1])) if pos else 0)
+
+    if surrounded[0] == surrounded[1]:
+        return 0.5
+
+    return 1.0 if surrounded[0] < surrounded[1] else 0.0
+
+
+
+class Node():
+
+    def __init__(self, move=None, parent=None, colour=None):
+
+        self.move     = move
+        self.parent   = parent
+
+        # Player who played 'move' : the node's wins are counted for that player
+        self.colour   = colour
+
+        self.children = []
+        self.untried  = None  # Legal moves not expanded yet, filled on first visit
+
+        self.visits   = 0
+        self.wins     = 0.0
+
+
+    def select_child(self, exploration):
+
+        log_visits = math.log(self.visits)
+
+        def ucb(child):
+            return child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+
+        return max(self.children, key=ucb)
+
+
+
+def search_tree(board, playouts, max_time, exploration, max_plies, seed):
+    """
+    Grows a UCT tree from 'board' for 'playouts' playouts, or until
+    'max_time' seconds have passed (either can be None, not both).
+    Returns a list of (move, visits, wins) for the root moves.
+    This is the job of one worker process.
+    """
+
+    rng      = random.Random(seed)
+    board    = Bitboard.Bitboard.from_board(board)
+    root     = Node()
+    deadline = time.perf_counter() + max_time if max_time is not None else None
+    done     = 0
+
+    while playouts is None or done < playouts:
+
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+
+        node  = root
+        plies = 0
+
+        # Selection : go down while every move of the node has a child
+
+        while node.untried == [] and node.children:
+            node = node.select_child(exploration)
+            board.make(node.move)
+            plies += 1
+
+        # Expansion : add one child
+
+        result = outcome(board)
+
+        if result is None:
+
+            if node.untried is None:
+                node.untried = Moves.legal_moves(board)
+                rng.shuffle(node.untried)
+
+            move  = node.untried.pop()
+            child = Node(move, node, board.player)
+            node.children.append(child)
+
+            board.make(move)
+            plies += 1
+            node = child
+
+            # Playout : random moves until the game is over
+
+            result  = outcome(board)
+            length  = 0
+
+            while result is None and length < max_plies:
+                board.make(rng.choice(Moves.legal_moves(board)))
+                plies  += 1
+                length += 1
+                result  = outcome(board)
+
+            if result is None:
+                result = adjudicate(board)
+
+        # Back-propagation
+
+        while node:
+            node.visits += 1
+
+            if node.colour is not None:
+                node.wins += result if node.colour == 0 else 1 - result
+
+            node = node.parent
+
+        for k in range(plies):
+            board.unmake()
+
+        done += 1
+
+    return [(child.move, child.visits, child.wins) for child in root.children]
+
+
+def search_tree_job(args):
+    return search_tree(*args)
+
+
+
+class MCTSPlayer():
+
+    def __init__(self, playouts=None, max_time=None, workers=None,
+                 exploration=1.4, max_plies=60, seed=None):
+        """
+        The budget of a move is either a number of 'playouts' (shared
+        between the workers), or 'max_time' seconds of wall-clock
+        time. 'workers' defaults to the number of cores; with a single
+        worker, everything runs in the current process.
+        """
+
+        if playouts is None and max_time is None:
+            max_time = 1.0
+
+        self.playouts    = playouts
+        self.max_time    = max_time
+        self.workers     = workers or os.cpu_count() or 1
+        self.exploration = exploration
+        self.max_plies   = max_plies
+
+        self.rng  = random.Random(seed)
+        self.pool = None
+
+        # Report of the last search
+        self.total_playouts = 0
+        self.elapsed        = 0.0
+        self.visits         = dict()
+
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+    def playouts_per_second(self):
+
+        if self.elapsed:
+            return self.total_playouts / self.elapsed
+
+        return 0.0
+
+
+    def report(self):
+        return ("%d playouts on %d workers in %.2f s (%.0f playouts/s)"
+                % (self.total_playouts, self.workers, self.elapsed, self.playouts_per_second()))
+
+
+    def best_move(self, board):
+        """
+        Returns the root move with the most visits, summed over all
+        the workers, or None if the game is over.
+        The board is not modified.
+        """
+
+        start = time.perf_counter()
+
+        moves = Moves.legal_moves(board)
+
+        if len(moves) < 2:
+            return moves[0] if moves else None
+
+        playouts = None
+        if self.playouts is not None:
+            playouts = -(-self.playouts // self.workers)
+
+        # The jobs get a copy of the board, without its observers (a
+        # BoardUI, an Evaluator...) which may not be sent to a worker
+        position = board.copy()
+
+        jobs = [(position, playouts, self.max_time, self.exploration, self.max_plies, self.rng.getrandbits(64))
+                for k in range(self.workers)]
+
+        if self.workers == 1:
+            results = [search_tree_job(jobs[0])]
+
+        else:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+
+            results = self.pool.map(search_tree_job, jobs)
+
+        self.visits = dict()
+
+        for tree in results:
+            for move, visits, wins in tree:
+                self.visits[move] = self.visits.get(move, 0) + visits
+
+        self.total_playouts = sum(self.visits.values())
+        self.elapsed        = time.perf_counter() - start
+
+        return max(self.visits, key=self.visits.get)
@@ -1,30 +1,65 @@
+import argparse
+
+import AlphaBeta
 import Board
-import BoardUI
 import Pieces
-import Moves
+import SelfPlay
+
+
+def start_game(ai_colour=None, max_time=2.0):
+    """
+    Plays a game in a BoardUI window. If 'ai_colour' is given, that
+    player is the computer, with 'max_time' seconds per move.
+    """
 
+    # Imported here, so that headless modes do not need pygame
+    import BoardUI
 
-def start_game():
     b = Board.Board()
     ui = BoardUI.BoardUI(b)
-    ui.render_step()
 
-    winner = -1
+    engine = None
+    if ai_colour is not None:
+        engine = AlphaBeta.AlphaBetaPlayer(max_time=max_time)
 
-    while True:
+    winner = ui.play(engine, ai_colour)
 
-        ui.wait_for_move()
-        
-        if Moves.has_lost(b, 0):
-            winner = 1
-            break
-        
-        if Moves.has_lost(b, 1):
-            winner = 0
-            break
+    # The window was closed
+    if winner is None:
+        return
 
     ui.render_endgame(winner)
     ui.manage_all_events()
 
+
+def self_play(games, white, black, output, workers=None):
+    """
+    Plays 'games' games between two engine configurations without any
+    window, and appends them to the file 'output' (see SelfPlay).
+    """
+
+    games_per_second, plies = SelfPlay.run(games, white, black, output, workers)
+
+    print("%.2f games/s, %.1f plies per game" % (games_per_second, plies))
+
+
 if __name__=="__main__":
-    start_game()
+
+    parser = argparse.ArgumentParser(description="Plays a game of Hive.")
+    parser.add_argument("--ai", type=int, choices=[1, 2],
+                        help="let the computer play as Player 1 or Player 2")
+    parser.add_argument("--movetime", type=float, default=2.0,
+                        help="thinking time of the computer, in seconds per move")
+    parser.add_argument("--self-play", type=int, metavar="N",
+                        help="play N games between two engines, without any window")
+    parser.add_argument("--white",   default="alphabeta:0.1", help="engine of the first player in self-play")
+    parser.add_argument("--black",   default="random",        help="engine of the second player in self-play")
+    parser.add_argument("--output",  default="games.txt",     help="file where self-play games are appended")
+    parser.add_argument("--workers", type=int,                help="number of processes for self-play")
+
+    args = parser.parse_args()
+
+    if args.self_play:
+        self_play(args.self_play, args.white, args.black, args.output, args.workers)
+    else:
+        start_game(ai_colour=args.ai - 1 if args.ai else None, max_time=args.movetime)
@@ -1,15 +1,16 @@
+import collections
+import threading
+
 import Board
+import Bitboard
 import Pieces
 
 
-### Todo : implement the "One-Hive Rule" -> Hive must be connex at any point
-
-directions = {"NORTH",
-              "SOUTH",
-              "NORTH-WEST",
-              "SOUTH-WEST",
-              "NORTH-EAST",
-              "SOUTH-EAST"}
+# Moves are compact tuples (symbol, from_cell, to_cell) :
+# - placing a new piece : ("A", None, (i, j))
+# - moving a piece      : ("A", (i, j), (x, y))
+# - passing, when nothing else is possible : PASS
+PASS = (None, None, None)
 
 
 # To be able to move to a certain location, a piece must be able to
@@ -55,98 +56,273 @@ def slip_moves(board, i, j):
     return moves
 
 
+def sliding_graph(board, i, j):
+    """
+    Returns the graph of the slides around the hive available to the
+    top piece of (i, j), as a dictionnary mapping each free cell of
+    the perimeter of the hive to the set of cells reachable from it
+    by a single slide.
+    The piece is considered lifted off the board, so that it can
+    neither block its own way nor lean on itself : its cell is free
+    unless other pieces remain under it. The board is not modified.
+    A slide is allowed when exactly one of the two cells on its sides
+    is occupied : two would block the way (freedom to move), none
+    would break the contact with the hive.
+    The cost is linear in the size of the perimeter.
+    """
+
+    hive = board.board
+
+    # Cell left empty by the lifted piece, if any
+    lifted = (i, j) if len(hive[(i, j)]) == 1 else None
+
+    perimeter = set()
+
+    for cell in hive:
+        if cell != lifted:
+            perimeter.update(c for c in board.neighbours(*cell) if c == lifted or c not in hive)
+
+    graph = dict()
+
+    for x, y in perimeter:
+
+        adj      = board.neighbours(x, y)
+        occupied = [cell in hive and cell != lifted for cell in adj]
+
+        graph[(x, y)] = {adj[k] for k in range(6)
+                         if not occupied[k] and occupied[k-1] != occupied[(k+1) % 6]}
+
+    return graph
+
+
 def is_connected(board):
 
+    if isinstance(board, Bitboard.Bitboard):
+        return board.is_connected()
+
     all_cells = board.all_cells_coord()
 
-    start = all_cells.pop()  # Takes any cell as starting point
+    if not all_cells:
+        return True
 
-    reachable = set()
-    reachable.add(start)
-    
-    done = False
-    
-    while not done:
-        done = True
+    start = next(iter(all_cells))  # Takes any cell as starting point
 
-        copy_reachable = reachable.copy()
-        
-        for cell in reachable:
+    reachable = {start}
+    to_visit  = [start]
+
+    while to_visit:
+        x, y = to_visit.pop()
+
+        for cell in board.occupied_adjacent_cells(x, y):
+            if cell not in reachable:
+                reachable.add(cell)
+                to_visit.append(cell)
+
+    return len(reachable) == len(all_cells)
+
+
+def pinned_cells(board, colour=None):
+    """
+    Returns the set of cells whose top piece cannot leave its cell
+    without breaking the One-Hive Rule, only among the cells of
+    'colour' if given.
+    These are the articulation points of the hive (Hopcroft-Tarjan),
+    found with a single depth-first search. A piece with something
+    under it is never pinned, as its cell stays occupied.
+    On a Bitboard, they are found with masks instead (see
+    Bitboard.pinned).
+    The result only depends on the position, so it should be computed
+    once and shared by all the move generators.
+    """
+
+    if isinstance(board, Bitboard.Bitboard):
+        mask = None if colour is None else board.colour_mask[colour]
+        return board.cells_of_mask(board.pinned(mask))
+
+    all_cells = board.all_cells_coord()
+
+    if not all_cells:
+        return set()
+
+    start = next(iter(all_cells))
+
+    depth = {start: 0}
+    low   = {start: 0}
+
+    articulation  = set()
+    root_children = 0
+
+    # Iterative DFS : each entry is (cell, parent, neighbours left to visit)
+    stack = [(start, None, iter(board.occupied_adjacent_cells(start[0], start[1])))]
+
+    while stack:
+        cell, parent, nghbs = stack[-1]
+
+        for nxt in nghbs:
+
+            if nxt not in depth:
+                depth[nxt] = low[nxt] = depth[cell] + 1
+                stack.append((nxt, cell, iter(board.occupied_adjacent_cells(nxt[0], nxt[1]))))
+                break
+
+            if nxt != parent:
+                low[cell] = min(low[cell], depth[nxt])
+
+        else:
+            stack.pop()
+
+            if parent is None:
+                continue
+
+            low[parent] = min(low[parent], low[cell])
+
+            if parent == start:
+                root_children += 1
+            elif low[cell] >= depth[parent]:
+                articulation.add(parent)
+
+    if root_children > 1:
+        articulation.add(start)
+
+    if colour is not None:
+        articulation &= board.cells_of_colour(colour)
 
-            occupied_adj = board.occupied_adjacent_cells(cell[0], cell[1])
+    return {(x, y) for x, y in articulation if len(board.all_pieces_on(x, y)) == 1}
 
-            for x, y in occupied_adj:
-                copy_reachable.add((x, y))
 
-        done = (reachable == copy_reachable)
+def keeps_hive_connected(board, from_cell, to_cell, pinned):
+    """
+    Returns True if moving the top piece of 'from_cell' to 'to_cell'
+    respects the One-Hive Rule, 'pinned' being pinned_cells(board).
+    Lifting a piece which is not pinned leaves the rest of the hive
+    connected, so we only need to check that the piece still touches
+    it once it lands.
+    """
+
+    if from_cell in pinned:
+        return False
+
+    x, y = to_cell
 
-        reachable = reachable.union(copy_reachable)
+    if board.piece_on(x, y):  # Climbing on top of the hive
+        return True
+
+    stays_occupied = len(board.all_pieces_on(from_cell[0], from_cell[1])) > 1
+
+    for cell in board.occupied_adjacent_cells(x, y):
+        if cell != from_cell or stays_occupied:
+            return True
 
-    return (len(reachable) == len(all_cells) + 1)  #+1 as we popped the start cell at the beginning !
+    return False
 
 
 
 # General function :
 
-def moves_piece(board, i, j):
+def moves_piece(board, i, j, pinned=None):
 
     p = board.piece_on(i, j)
 
-    if isinstance(p, Pieces.Queen):
-        return moves_queen(board, i, j)
+    if pinned is None:
+        pinned = pinned_cells(board)
 
-    if isinstance(p, Pieces.Spider):
-        return moves_spider(board, i, j)
+    return piece_moves[p.symbol](board, i, j, pinned)
 
-    if isinstance(p, Pieces.Beetle):
-        return moves_beetle(board, i, j)
 
-    if isinstance(p, Pieces.Grasshopper):
-        return moves_grasshopper(board, i, j)
 
-    if isinstance(p, Pieces.Ant):
-        return moves_ant(board, i, j)
+def legal_moves(board):
+    """
+    Returns the list of all the legal moves of board.player, as
+    compact move tuples (see PASS above).
+    Placements follow board.spawn_cells_for_colour, the Queen must
+    be placed at move 4 at the latest, and no piece can move before
+    the Queen is on the board.
+    Returns an empty list if the game is over, and [PASS] if the
+    player has nothing else to do.
+    """
+
+    moves = []
+
+    if has_lost(board, 0) or has_lost(board, 1):
+        return moves
+
+    if isinstance(board, Bitboard.Bitboard):
+        return board.legal_moves() or [PASS]
+
+    colour    = board.player
+    remaining = board.remaining_pieces[colour]
+
+    # Placements
+
+    if board.movecount == 4 and not board.queens[colour]:
+        symbols = ["Q"]
+    else:
+        symbols = [s for s in remaining if remaining[s]]
+
+    if symbols:
+        for cell in board.spawn_cells_for_colour(colour):
+            for s in symbols:
+                moves.append((s, None, cell))
+
+    # Movements
+
+    if board.queens[colour]:
+
+        pinned = pinned_cells(board, colour)
+
+        for i, j in board.cells_of_colour(colour):
+
+            symbol = board.piece_on(i, j).symbol
+
+            for cell in moves_piece(board, i, j, pinned):
+                moves.append((symbol, (i, j), cell))
+
+    if not moves:
+        moves.append(PASS)
+
+    return moves
+
+
+
+def count_legal_moves(board):
+    """
+    Returns len(legal_moves(board)). On a Bitboard, the moves are
+    counted from the masks, without being built.
+    """
+
+    if not isinstance(board, Bitboard.Bitboard):
+        return len(legal_moves(board))
+
+    if has_lost(board, 0) or has_lost(board, 1):
+        return 0
+
+    # Nothing to do : PASS is the only move
+    return board.count_moves() or 1
+
 
-    
 
 def place_piece(board, i, j, piece):
     """
     Returns True and updates the board 'board' if placing
     the piece 'piece' on the cell (i, j) was legal.
     Returns False and doesn't modify the board otherwise.
+    The board gets its own piece of the same type and colour
+    (see Board.make).
     """
 
     colour = piece.colour
 
     assert(colour == board.player)
 
-    # Can't place a piece on top of another
-    
-    if board.piece_on(i, j):
-        return False
+    # Can't place a piece on top of another, away from the hive,
+    # or next to ennemy pieces (unless it is the first move).
+    # The first piece of the game can go anywhere.
 
-    # Can't place a piece which is not connected to the
-    # hive
-    board.board[i][j].append(Pieces.Queen())
-    connected = is_connected(board)
-    board.board[i][j].pop()
-    
-    if not connected:
+    if board.board and (i, j) not in board.spawn_cells_for_colour(colour):
         return False
 
-    # Can't place a piece with adjacent ennemy pieces, unless
-    # it is the first move
-    if board.movecount > 1:
-
-        occupied_nghb = board.occupied_adjacent_cells(i, j)
-
-        for x, y in occupied_nghb:
-            p = board.piece_on(x, y)
-            if p.colour != colour:
-                return False
-
     # Must place the Queen before or at move 4
-    if board.movecount == 4:
+    if board.movecount == 4 and not isinstance(piece, Pieces.Queen):
         if not board.queens[colour]:
             return False
 
@@ -160,24 +336,7 @@ def place_piece(board, i, j, piece):
     # Here, we have checked that this move was indeed legal,
     # so we put the piece on the board !
 
-    # First, we check that whether this is the very first move
-    # of the game, and if it is, we set board's bounds to this
-    # cell.
-
-    if board.first_move():
-        board.set_bounds(i, j)
-        
-    board.add_piece(i, j, piece)
-
-    board.remaining_pieces[piece.colour][piece.symbol] -= 1
-
-    if board.player == 1:
-        board.movecount += 1
-    board.player = 1 - board.player
-
-
-    if isinstance(piece, Pieces.Queen):
-        board.queens[colour] = True
+    board.make((symbol, None, (i, j)))
 
     return True
 
@@ -188,11 +347,15 @@ def has_lost(board, colour):
     # We lose if our Queen is surrounded
     pos = board.queen_position(colour)
 
-    if pos:
-        number_nhgb = len(board.occupied_adjacent_cells(pos[0], pos[1]))
-        return number_nhgb == 6
+    if not pos:
+        return False
+
+    for x, y in board.neighbours(pos[0], pos[1]):
 
-    return False
+        if not board.piece_on(x, y):
+            return False
+
+    return True
 
 
 
@@ -201,37 +364,37 @@ def simulate_move(board, from_cell, to_cell):
     i, j = from_cell
     x, y = to_cell
     
-    p = board.board[i][j].pop()
-    board.board[x][y].append(p)
+    p = board.remove_piece(i, j)
+    board.add_piece(x, y, p)
     
 
 
-def play_legal_move(board, from_cell, to_cell):
+def play_legal_move(board, from_cell, to_cell, use_cache=True):
     """
     If the asked move if legal, plays it and returns True.
     Otherwise, the board is not modified, and the function returns
     False.
+    The moves are looked for in move_cache, unless 'use_cache' is
+    False : when replaying games, positions never come back.
     """
 
-    legal_moves = moves_piece(board, from_cell[0], from_cell[1])
-
     p = board.piece_on(from_cell[0], from_cell[1])
 
-    # Last legality check : we cannot move if we have not placed
-    # our Queen on the board yet
+    # We cannot move if we have not placed our Queen on the board yet
     if not board.queens[p.colour]:
         return False
 
+    # The same moves were usually just generated to show them to the
+    # player : they are taken from the cache
+    if use_cache:
+        legal_moves = cached_moves_piece(board, from_cell[0], from_cell[1])
+    else:
+        legal_moves = moves_piece(board, from_cell[0], from_cell[1])
+
     if to_cell in legal_moves:
 
-        p = board.remove_piece(from_cell[0], from_cell[1])
+        board.make((p.symbol, from_cell, to_cell))
 
-        board.add_piece(to_cell[0], to_cell[1], p)
-        
-        if board.player == 1:
-            board.movecount += 1
-        board.player = 1 - board.player
-        
         return True
 
     return False
@@ -242,30 +405,36 @@ def play_legal_move(board, from_cell, to_cell):
 
 # A queen moves freely, but only of 1 cell
 
-def moves_queen(board, i, j):
+def moves_queen(board, i, j, pinned=None):
 
     moves = set()
     
     us = board.piece_on(i, j)
     assert(isinstance(us, Pieces.Queen))
 
+    if pinned is None:
+        pinned = pinned_cells(board)
+
+    if (i, j) in pinned:
+        return moves
+
+    if isinstance(board, Bitboard.Bitboard):
+        return board.slide_moves(i, j, 1)
+
     potential_moves = slip_moves(board, i, j)
 
     for x, y in potential_moves:
 
-        simulate_move(board, (i, j), (x, y))
-        if is_connected(board):
+        if keeps_hive_connected(board, (i, j), (x, y), pinned):
             moves.add((x, y))
 
-        simulate_move(board, (x, y), (i, j))
-
     return moves
 
 
 # A beetle moves freely of 1 cell , and can even jump on other pieces,
 # regardless of their colour
 
-def moves_beetle(board, i, j):
+def moves_beetle(board, i, j, pinned=None):
 
     moves = set()
 
@@ -274,22 +443,22 @@ def moves_beetle(board, i, j):
     us = board.piece_on(i, j)
     assert(isinstance(us, Pieces.Beetle))
 
+    if pinned is None:
+        pinned = pinned_cells(board)
 
-    adj = board.adjacent_cells(i, j)
+    if (i, j) in pinned:
+        return moves
 
-    for d in directions:
-        if adj[d]:
-            potential_moves.add(adj[d])
+    if isinstance(board, Bitboard.Bitboard):
+        return board.step_moves(i, j)
 
+    potential_moves.update(board.neighbours(i, j))
 
     for x, y in potential_moves:
 
-        simulate_move(board, (i, j), (x, y))
-        if is_connected(board):
+        if keeps_hive_connected(board, (i, j), (x, y), pinned):
             moves.add((x, y))
 
-        simulate_move(board, (x, y), (i, j))
-        
     return moves
 
 
@@ -297,125 +466,236 @@ def moves_beetle(board, i, j):
 # both colours, until they reach a 'free' space (over which they can't
 # jump : they must stop upon reaching an empty cell).
 
-def moves_grasshopper(board, i, j):
+def moves_grasshopper(board, i, j, pinned=None):
 
     moves = set()
 
     us = board.piece_on(i, j)
     assert(isinstance(us, Pieces.Grasshopper))
-    
-    for d in directions:
-        x, y = i, j
+
+    if pinned is None:
+        pinned = pinned_cells(board)
+
+    if (i, j) in pinned:
+        return moves
+
+    if isinstance(board, Bitboard.Bitboard):
+        return board.jump_moves(i, j)
+
+    for d in range(6):
+        x, y = board.neighbours(i, j)[d]
+
+        # A grasshopper must jump over at least one piece
+        if not board.piece_on(x, y):
+            continue
 
         while board.piece_on(x, y):
-            x, y = board.adjacent_cells(x, y)[d]
+            x, y = board.neighbours(x, y)[d]
 
-        simulate_move(board, (i, j), (x, y))
-        if is_connected(board):
+        if keeps_hive_connected(board, (i, j), (x, y), pinned):
             moves.add((x, y))
 
-        simulate_move(board, (x, y), (i, j))
-
     return moves
 
 
 # Spiders move by slipping out of their cells three times in a row,
 # no more no less, and without possibility of 'backtracking'.
 
-def moves_spider(board, i, j):
+def moves_spider(board, i, j, pinned=None):
 
     moves = set()
 
     us = board.piece_on(i, j)
     assert(isinstance(us, Pieces.Spider))
 
-    paths     = [[(i, j)]]
-    new_paths = []
+    if pinned is None:
+        pinned = pinned_cells(board)
 
-    for k in range(3):
+    if (i, j) in pinned:
+        return moves
 
-        for path in paths:
+    if isinstance(board, Bitboard.Bitboard):
+        return board.slide_moves(i, j, 3)
 
-            x, y = path[-1]
+    graph = sliding_graph(board, i, j)
 
-            simulate_move(board, (i, j), (x, y))
-            
-            potential_next_pos = slip_moves(board, x, y)
+    # Paths of exactly 3 slides, never going back to a cell already
+    # visited
+
+    paths = [[(i, j)]]
+
+    for k in range(3):
+        paths = [path + [cell] for path in paths
+                 for cell in graph.get(path[-1], ()) if cell not in path]
+
+    for path in paths:
+        moves.add(path[-1])
 
-            simulate_move(board, (x, y), (i, j))
+    return moves
 
-            next_pos = set()
 
-            # Check that the next pos are actually legal moves
+# Ants move as much as they want, but they have to respect the 'slipping' rule
+def moves_ant(board, i, j, pinned=None):
 
-            for a, b in potential_next_pos:
+    moves = set()
 
-                simulate_move(board, (i, j), (a, b))
+    us= board.piece_on(i, j)
+    assert(isinstance(us, Pieces.Ant))
 
-                if is_connected(board):
-                    next_pos.add((a, b))
+    if pinned is None:
+        pinned = pinned_cells(board)
 
-                simulate_move(board, (a, b), (i, j))
+    if (i, j) in pinned:
+        return moves
 
+    if isinstance(board, Bitboard.Bitboard):
+        return board.slide_moves(i, j)
 
-            next_pos = next_pos.difference(set(path)) # We can't go back !
+    # Any cell of the sliding graph that can be reached from the ant's
+    # cell is a legal move
 
-            for next_p in next_pos:
-                new_paths.append(path + [next_p])
+    graph = sliding_graph(board, i, j)
 
-        paths     = new_paths
-        new_paths = []
+    to_visit = [(i, j)]
 
+    while to_visit:
+        cell = to_visit.pop()
 
-    for path in paths:
-        final_pos = path[-1]
+        for nxt in graph.get(cell, ()):
+            if nxt not in moves:
+                moves.add(nxt)
+                to_visit.append(nxt)
 
-        moves.add(final_pos)
+    moves.discard((i, j))
 
     return moves
 
+# Move generator of each piece, from its symbol (see moves_piece)
+piece_moves = {"Q" : moves_queen,
+               "B" : moves_beetle,
+               "S" : moves_spider,
+               "A" : moves_ant,
+               "G" : moves_grasshopper}
 
-# Ants move as much as they want, but they have to respect the 'slipping' rule
-def moves_ant(board, i, j):
+#####################################################################
 
-    moves = set()
+# Move cache
 
-    us= board.piece_on(i, j)
-    assert(isinstance(us, Pieces.Ant))
+class MoveCache():
+    """
+    Bounded cache of generated moves, keyed by the position they were
+    generated from (Board.hash), so that a position seen again does
+    not have to be generated again. Every change to the board changes
+    its hash, so entries never need to be invalidated : a position
+    which is left is simply not asked for anymore, until it comes
+    back. When the cache is full, the least recently used entry is
+    evicted.
+    The cache can be shared between threads (see BoardUI.Worker).
+    """
 
-    moves     = set()
-    new_moves = set()
-    
-    moves.add((i, j))
-    new_moves.add((i, j))
-    
-    done = False
-    
-    while not done:
+    def __init__(self, capacity=100000):
 
-        moves_added_last_step = new_moves.copy()
-        
-        prev_len = len(moves)
-        new_moves = set()
-        
-        for cell in moves_added_last_step:
+        self.capacity = capacity
+        self.entries  = collections.OrderedDict()
+        self.lock     = threading.Lock()
 
-            pot_new_moves = slip_moves(board, cell[0], cell[1])
+        self.hits     = 0
+        self.misses   = 0
 
-            for x, y in pot_new_moves:
-                
-                simulate_move(board, (i, j), (x, y))
-                
-                if is_connected(board):
-                    new_moves.add((x, y))
-                    
-                simulate_move(board, (x, y), (i, j))
 
-        moves = moves.union(new_moves)
-        new_len = len(moves)
+    def __len__(self):
+        return len(self.entries)
 
-        done = (prev_len == new_len)
 
-    moves.remove((i, j))
-        
-    return moves
+    def get(self, key):
+        """
+        Returns the entry of 'key', or None if there is none.
+        """
+
+        with self.lock:
+
+            value = self.entries.get(key)
+
+            if value is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+            return value
+
+
+    def put(self, key, value):
+
+        with self.lock:
+
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+
+    def clear(self):
+
+        with self.lock:
+
+            self.entries.clear()
+            self.hits   = 0
+            self.misses = 0
+
+
+    def hit_rate(self):
+
+        if self.hits + self.misses:
+            return self.hits / (self.hits + self.misses)
+
+        return 0.0
+
+
+    def report(self):
+        return ("%d entries, %d hits, %d misses (%.0f %% hits)"
+                % (len(self), self.hits, self.misses, 100 * self.hit_rate()))
+
+
+# Shared by the functions below when no other cache is given
+move_cache = MoveCache()
+
+
+def cached_moves_piece(board, i, j, cache=None):
+    """
+    Same as moves_piece(board, i, j), through 'cache' (move_cache by
+    default). The moves of a piece only depend on the pieces on the
+    board, so the key is the hash of the position and the cell.
+    Returns a new set, which the caller can modify.
+    """
+
+    cache = cache if cache is not None else move_cache
+    key   = (board.hash, i, j)
+    moves = cache.get(key)
+
+    if moves is None:
+        moves = frozenset(moves_piece(board, i, j))
+        cache.put(key, moves)
+
+    return set(moves)
+
+
+def cached_legal_moves(board, cache=None):
+    """
+    Same as legal_moves(board), through 'cache' (move_cache by default).
+    The placements also depend on the move number, which is part of
+    the key.
+    Returns a new list, which the caller can modify.
+    """
+
+    cache = cache if cache is not None else move_cache
+    key   = (board.hash, board.movecount)
+    moves = cache.get(key)
+
+    if moves is None:
+        moves = tuple(legal_moves(board))
+        cache.put(key, moves)
+
+    return list(moves)
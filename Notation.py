@@ -0,0 +1,356 @@
+## Reading and writing games in the standard Hive notation used by
+## Boardspace and the Universal Hive Protocol (UHP).
+#
+## Pieces are named by their colour (w for Player 1, b for Player 2),
+## their symbol, and their rank among the pieces of the same type :
+## wQ, bA1, bA2, wS1 ... (the Queen has no number).
+## A move names the piece, then where it goes, relatively to a piece
+## already on the board : "bA1 wQ-" puts bA1 on the right of wQ.
+## The position of the mark around the reference piece gives the
+## direction :
+#
+##          \wQ   wQ/
+##      -wQ     wQ     wQ-
+##          /wQ   wQ\
+#
+## Without any mark, the piece climbs on top of the reference piece
+## (Beetles only). The first piece of the game has no reference, and
+## a player who cannot move writes "pass".
+#
+## UHP draws hexagons with a pointy top, while this board has a flat
+## top. Both share the same axial coordinates, so the directions
+## are matched through them (see DIRECTION_MARKS).
+#
+## A game is one line : "Base;<state>;<turn>;<move>;<move>;...",
+## e.g. "Base;InProgress;White[3];wS1;bG1 -wS1;wA1 wS1/;bG2 /bG1".
+## Lines may start with extra tab separated fields (for instance the
+## engines of a self-play game), which are kept as tags.
+## Files are read one line at a time, so that memory use does not
+## depend on the size of the file.
+
+import Board
+import Moves
+import Pieces
+
+
+COLOURS = "wb"
+
+# Mark around the reference piece, for each direction (see Board.DIRECTIONS)
+# from the reference piece to the destination
+DIRECTION_MARKS = {"NORTH"      : "\\%s",
+                   "NORTH-EAST" : "%s/",
+                   "SOUTH-EAST" : "%s-",
+                   "SOUTH"      : "%s\\",
+                   "SOUTH-WEST" : "/%s",
+                   "NORTH-WEST" : "-%s"}
+
+STATES = {0: "WhiteWins", 1: "BlackWins", None: "Draw"}
+
+
+def piece_name(p):
+
+    name = COLOURS[p.colour] + p.symbol
+
+    if p.symbol != "Q":
+        name += str(p.number)
+
+    return name
+
+
+def parse_name(name):
+    """
+    Splits the piece name 'name' into (colour, symbol, number), the
+    number being 1 if it is left out. Raises ValueError if 'name' is
+    not the name of a piece (see piece_name).
+    """
+
+    if len(name) < 2 or name[0] not in COLOURS or name[1] not in Pieces.starting_pieces:
+        raise ValueError("Not a piece : %r" % name)
+
+    colour = COLOURS.index(name[0])
+    symbol = name[1]
+    rank   = name[2:]
+
+    if not rank:
+        return colour, symbol, 1
+
+    # The Queen has no number, and the others one of 1, 2 ...
+    if symbol == "Q" or not rank.isdigit() or not 1 <= int(rank) <= Pieces.starting_pieces[symbol]:
+        raise ValueError("Not a piece : %r" % name)
+
+    return colour, symbol, int(rank)
+
+
+def find_piece(board, name):
+    """
+    Returns the piece of 'board' named 'name', or None if it is not
+    on the board. Raises ValueError if 'name' is not a piece name.
+    """
+
+    colour, symbol, number = parse_name(name)
+
+    for p in board.pieces_of(colour, symbol):
+        if p.number == number or symbol == "Q":
+            return p
+
+    return None
+
+#####################################################################
+
+# Moves
+
+def move_to_string(board, move):
+    """
+    Writes 'move', a move tuple (see Moves.legal_moves) about to be
+    played on 'board', in notation.
+    """
+
+    if move == Moves.PASS:
+        return "pass"
+
+    symbol, from_cell, to_cell = move
+
+    if from_cell:
+        name = piece_name(board.piece_on(from_cell[0], from_cell[1]))
+    else:
+        rank = Pieces.starting_pieces[symbol] - board.remaining_pieces[board.player][symbol] + 1
+        name = COLOURS[board.player] + symbol + (str(rank) if symbol != "Q" else "")
+
+    if not board.board:
+        return name
+
+    # Climbing on top of another piece
+
+    if board.piece_on(to_cell[0], to_cell[1]):
+        return name + " " + piece_name(board.piece_on(to_cell[0], to_cell[1]))
+
+    # Otherwise, any neighbour of the destination will do, except the
+    # moving piece itself
+
+    neighbours = board.neighbours(to_cell[0], to_cell[1])
+
+    for d in range(6):
+
+        x, y  = neighbours[d]
+        stack = board.all_pieces_on(x, y)
+
+        if (x, y) == from_cell:
+            stack = stack[:-1]
+
+        if stack:
+            # The destination is in the opposite direction, seen from the reference
+            mark = DIRECTION_MARKS[Board.DIRECTIONS[(d + 3) % 6]]
+            return name + " " + mark % piece_name(stack[-1])
+
+    raise ValueError("The destination of %r touches no other piece" % (move,))
+
+
+def string_to_move(board, text):
+    """
+    Reads the move 'text', written in notation, as a move tuple
+    to be played on 'board'. Raises ValueError if it makes no sense
+    on this board (it is not checked for legality).
+    """
+
+    text = text.strip()
+
+    if text == "pass":
+        return Moves.PASS
+
+    words = text.split()
+
+    if not 1 <= len(words) <= 2:
+        raise ValueError("Not a move : %r" % text)
+
+    name      = words[0]
+    reference = words[1] if len(words) > 1 else None
+
+    try:
+        colour, symbol, number = parse_name(name)
+    except ValueError as e:
+        raise ValueError("%s in %r" % (e, text))
+
+    if colour != board.player:
+        raise ValueError("Not a move for this player : %r" % text)
+
+    # Destination
+
+    if reference is None:
+        if board.board:
+            raise ValueError("Missing reference piece : %r" % text)
+        to_cell = board.center
+
+    else:
+        direction = None
+
+        for d, mark in DIRECTION_MARKS.items():
+            before, after = mark.split("%s")
+            if before and reference.startswith(before) or after and reference.endswith(after):
+                direction = d
+                reference = reference.strip("\\/-")
+                break
+
+        try:
+            ref = find_piece(board, reference)
+        except ValueError as e:
+            raise ValueError("%s in %r" % (e, text))
+
+        if ref is None:
+            raise ValueError("Reference piece %s is not on the board : %r" % (reference, text))
+
+        to_cell = ref.coords
+
+        if direction:
+            to_cell = board.neighbours(to_cell[0], to_cell[1])[Board.DIRECTIONS.index(direction)]
+
+    # Placement or movement
+
+    p = find_piece(board, name)
+
+    if p is None:
+        # Pieces are placed in the order of their numbers
+        rank = Pieces.starting_pieces[symbol] - board.remaining_pieces[colour][symbol] + 1
+
+        if number != rank:
+            raise ValueError("%s is placed before %s%s%d : %r" % (name, COLOURS[colour], symbol, rank, text))
+
+        return (symbol, None, to_cell)
+
+    if board.piece_on(p.coords[0], p.coords[1]) is not p:
+        raise ValueError("%s is covered and cannot move : %r" % (name, text))
+
+    return (symbol, p.coords, to_cell)
+
+#####################################################################
+
+# Games
+
+def game_string(board, tags=(), state=None):
+    """
+    Writes the game played on 'board' (all the moves of its history,
+    see Board.make) as one line of notation, without the newline.
+    'tags' are written first, separated by tabs. 'state' overrides the
+    state of the game (see game_state), for instance to record a game
+    stopped before its end as a Draw.
+    """
+
+    replay = Board.Board()
+    moves  = []
+
+    for record in board.history:
+        move = record[0]
+        moves.append(move_to_string(replay, move))
+        replay.make(move)
+
+    turn = "%s[%d]" % (("White", "Black")[board.player], board.movecount)
+
+    return "\t".join(list(tags) + [";".join(["Base", state or game_state(board), turn] + moves)])
+
+
+def game_state(board):
+    """
+    State of the game on 'board', as written in notation : NotStarted,
+    InProgress, WhiteWins, BlackWins or Draw.
+    """
+
+    lost = (Moves.has_lost(board, 0), Moves.has_lost(board, 1))
+
+    if any(lost):
+        return STATES[None if all(lost) else 1 - lost.index(True)]
+
+    if board.history:
+        return "InProgress"
+
+    return "NotStarted"
+
+
+def parse_game(line):
+    """
+    Splits a line of notation into (tags, state, moves), 'moves' being
+    the list of the moves, as strings.
+    """
+
+    fields = line.rstrip("\n").split("\t")
+    tags, game = fields[:-1], fields[-1]
+
+    parts = game.split(";")
+
+    if len(parts) < 3:
+        raise ValueError("Not a game : %r" % line)
+
+    return tags, parts[1], [m for m in parts[3:] if m]
+
+
+def read_games(lines):
+    """
+    Generator over the games of 'lines' (an open file, or any iterable
+    of lines), as (tags, state, moves) tuples. Lines are read one at
+    a time, and blank lines are skipped.
+    """
+
+    for line in lines:
+        if line.strip():
+            yield parse_game(line)
+
+
+def replay(moves, board=None):
+    """
+    Generator which plays the moves of 'moves' (strings in notation)
+    one after the other on 'board' (a new Board by default), through
+    Moves.place_piece and Moves.play_legal_move, and yields the board
+    after each of them.
+    Raises ValueError on the first illegal move.
+    """
+
+    if board is None:
+        board = Board.Board()
+
+    for ply, text in enumerate(moves):
+
+        try:
+            move = string_to_move(board, text)
+        except ValueError as e:
+            raise ValueError("Move %d : %s" % (ply + 1, e))
+
+        symbol, from_cell, to_cell = move
+
+        if move == Moves.PASS:
+            legal = Moves.legal_moves(board) == [Moves.PASS]
+            if legal:
+                board.make(move)
+
+        elif from_cell:
+            legal = Moves.play_legal_move(board, from_cell, to_cell, use_cache=False)
+
+        else:
+            piece = Pieces.piece_classes[symbol](board.player)
+            legal = Moves.place_piece(board, to_cell[0], to_cell[1], piece)
+
+        if not legal:
+            raise ValueError("Illegal move %d : %r" % (ply + 1, text))
+
+        yield board
+
+
+
+class GameWriter():
+    """
+    Appends games to a file, one line each, as soon as they are
+    written, so that nothing is kept in memory.
+    """
+
+    def __init__(self, path, mode="a"):
+        self.file = open(path, mode)
+
+    def write(self, board, tags=()):
+        self.file.write(game_string(board, tags) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
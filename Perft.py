@@ -0,0 +1,168 @@
+## Perft : counts the leaf nodes of the game tree up to a given depth,
+## from a few reference positions, and measures how fast the moves
+## are generated.
+## On a Bitboard, the moves of the last ply are only counted, from
+## the masks, without being built (bulk counting).
+## The node counts of the reference positions are checked in
+## test_perft.py, so that any change to the move generation is both
+## proven correct and measured.
+#
+## Usage :
+#
+#   python Perft.py [--depth N] [--position NAME ...] [--bitboard]
+
+import argparse
+import time
+
+import Bitboard
+import Board
+import Moves
+
+
+# Each position is given by the moves leading to it from the empty board
+positions = {
+    # Empty board
+    "opening": [],
+
+    # Both Queens out, fourteen pieces on the board
+    "midgame": [
+                ('G', None, (9, 14)),
+                ('A', None, (9, 15)),
+                ('Q', None, (8, 13)),
+                ('B', None, (10, 15)),
+                ('Q', (8, 13), (8, 14)),
+                ('A', None, (11, 15)),
+                ('S', None, (7, 14)),
+                ('Q', None, (12, 16)),
+                ('B', None, (6, 13)),
+                ('S', None, (11, 14)),
+                ('A', None, (8, 13)),
+                ('B', None, (11, 16)),
+                ('A', (8, 13), (9, 13)),
+                ('Q', (12, 16), (12, 15)),
+                ('A', (9, 13), (7, 15)),
+                ('S', (11, 14), (13, 15)),
+                ('A', (7, 15), (10, 16)),
+                ('B', (10, 15), (9, 15)),
+                ('S', None, (5, 13)),
+                ('A', None, (14, 16)),
+                ('A', None, (6, 12)),
+                ('G', None, (14, 14)),
+    ],
+
+    # Six Ants around the hive, the three Ants of the player to move
+    # being free to run around it
+    "ants": [
+                ('B', None, (9, 14)),
+                ('A', None, (9, 15)),
+                ('A', None, (8, 14)),
+                ('A', None, (10, 15)),
+                ('A', None, (9, 13)),
+                ('A', None, (9, 16)),
+                ('Q', None, (10, 13)),
+                ('Q', None, (11, 15)),
+                ('A', (8, 14), (8, 17)),
+                ('S', None, (12, 15)),
+                ('A', (8, 17), (11, 16)),
+                ('B', None, (12, 14)),
+                ('A', None, (9, 12)),
+                ('A', (9, 16), (8, 15)),
+                ('A', (9, 12), (8, 13)),
+                ('A', (8, 15), (11, 13)),
+    ],
+
+    # Beetles on top of other pieces
+    "beetles": [
+                ('G', None, (9, 14)),
+                ('B', None, (9, 15)),
+                ('B', None, (8, 13)),
+                ('B', None, (10, 15)),
+                ('B', None, (8, 12)),
+                ('A', None, (11, 15)),
+                ('Q', None, (7, 12)),
+                ('Q', None, (12, 16)),
+                ('G', None, (7, 13)),
+                ('G', None, (12, 15)),
+                ('B', (8, 12), (8, 13)),
+                ('G', None, (12, 17)),
+                ('B', (8, 13), (7, 13)),
+                ('S', None, (13, 16)),
+                ('B', (7, 13), (7, 12)),
+                ('G', (12, 15), (11, 17)),
+                ('B', (7, 12), (7, 11)),
+                ('A', None, (11, 18)),
+                ('B', (7, 11), (7, 12)),
+                ('A', None, (14, 16)),
+                ('A', None, (8, 14)),
+                ('S', None, (13, 17)),
+                ('B', (8, 13), (7, 13)),
+                ('S', (13, 16), (11, 14)),
+    ],
+}
+
+
+def build(name, board_class=Board.Board):
+    """
+    Returns a new board of class 'board_class' holding the
+    reference position 'name'.
+    """
+
+    board = board_class()
+
+    for move in positions[name]:
+        board.make(move)
+
+    return board
+
+
+def perft(board, depth):
+    """
+    Returns the number of leaf nodes of the game tree of depth 'depth'
+    from 'board'. Positions where the game is over are not expanded.
+    The board is left as it was.
+    """
+
+    if depth == 0:
+        return 1
+
+    # Bulk counting : the moves of the last ply are counted, not played
+    if depth == 1:
+        return Moves.count_legal_moves(board)
+
+    moves = Moves.legal_moves(board)
+
+    nodes = 0
+
+    for move in moves:
+        board.make(move)
+        nodes += perft(board, depth - 1)
+        board.unmake()
+
+    return nodes
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Counts leaf nodes of the Hive game tree.")
+    parser.add_argument("--depth",    type=int, default=2)
+    parser.add_argument("--position", action="append", choices=sorted(positions))
+    parser.add_argument("--bitboard", action="store_true", help="use Bitboard instead of Board")
+
+    args = parser.parse_args()
+
+    board_class = Bitboard.Bitboard if args.bitboard else Board.Board
+
+    for name in args.position or positions:
+
+        board = build(name, board_class)
+
+        start   = time.perf_counter()
+        nodes   = perft(board, args.depth)
+        elapsed = time.perf_counter() - start
+
+        print("%-10s depth %d : %10d nodes  %8.3f s  %10.0f nodes/s"
+              % (name, args.depth, nodes, elapsed, nodes / elapsed))
+
+
+if __name__=="__main__":
+    main()
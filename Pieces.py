@@ -2,61 +2,122 @@
 ## Their moves will be defined in another file
 
 class Piece():
+    """
+    A piece only holds what differs between two pieces of the same
+    type : its colour, its location and its rank. The type is given
+    by the class, whose 'symbol' is shared by all its pieces.
+    With __slots__, pieces have no __dict__ : they are small and fast
+    to copy, which matters when many boards are kept at once.
+    """
 
-    def __init__(self):
+    __slots__ = ("colour", "coords", "height", "number")
 
-        self.colour = 0
-        self.coords = (0, 0)
-        self.symbol = None
+    symbol = None
+
+    def __init__(self, colour=0):
+
+        self.colour = colour
+
+        # Location of the piece, kept up to date by the Board.
+        # Both are None while the piece is not on the board.
+        self.coords = None
+        self.height = None
+
+        # Rank of the piece among the pieces of the same type and
+        # colour, in the order they were placed (1 for the first Ant,
+        # 2 for the second one ...). Set by Board.make.
+        self.number = None
         
     def __repr__(self):
         return self.symbol
 
 
+    def copy(self):
+
+        new = self.__class__.__new__(self.__class__)
+
+        new.colour = self.colour
+        new.coords = self.coords
+        new.height = self.height
+        new.number = self.number
+
+        return new
+
+
+    @property
+    def code(self):
+        """
+        The piece as a small integer (see from_code) : its type in the
+        lowest 3 bits, then its colour, then its rank.
+        """
+
+        return type_ids[self.symbol] | self.colour << 3 | (self.number or 0) << 4
+
+
+    @staticmethod
+    def from_code(code):
+        """
+        Returns a new piece (not on any board) from its integer code.
+        """
+
+        p = piece_classes[type_symbols[code & 7]]((code >> 3) & 1)
+        p.number = (code >> 4) or None
+
+        return p
+
+
 class Queen(Piece):
 
-    def __init__(self, colour=0):
-        super(Queen, self).__init__()
-        
-        self.colour = colour
-        self.symbol = "Q"
+    __slots__ = ()
+
+    symbol = "Q"
 
         
 class Spider(Piece):
 
-    def __init__(self, colour=0):
-        super(Spider, self).__init__()
-        
-        self.colour = colour
-        self.symbol = "S"
+    __slots__ = ()
+
+    symbol = "S"
 
 
 class Beetle(Piece):
 
-    def __init__(self, colour=0):
-        super(Beetle, self).__init__()
-        
-        self.colour = colour
-        self.symbol = "B"
+    __slots__ = ()
+
+    symbol = "B"
 
 
 class Grasshopper(Piece):
 
-    def __init__(self, colour=0):
-        super(Grasshopper, self).__init__()
-        
-        self.colour = colour
-        self.symbol = "G"
+    __slots__ = ()
+
+    symbol = "G"
 
 
 class Ant(Piece):
 
-    def __init__(self, colour=0):
-        super(Ant, self).__init__()
-        
-        self.colour = colour
-        self.symbol = "A"
+    __slots__ = ()
+
+    symbol = "A"
+
+
+
+# Class of each piece, from its symbol
+piece_classes = {"Q" : Queen,
+                 "B" : Beetle,
+                 "S" : Spider,
+                 "A" : Ant,
+                 "G" : Grasshopper}
+
+
+# Small integer for each symbol, for tables and hashing
+type_ids = {"Q" : 0,
+            "B" : 1,
+            "S" : 2,
+            "A" : 3,
+            "G" : 4}
 
+type_symbols = {i: s for s, i in type_ids.items()}
 
 
 all_pieces_name = {"Queen",
@@ -0,0 +1,123 @@
+## Headless self-play : plays many games between two engine
+## configurations, spread over a pool of worker processes, and
+## streams each finished game to a record file as soon as it ends.
+## Nothing here imports pygame, so it runs on machines without a
+## display.
+#
+## Engine configurations are short strings :
+#
+#   random           plays a random legal move
+#   alphabeta:T      AlphaBeta.AlphaBetaPlayer, T seconds per move
+#   mcts:N           MCTS.MCTSPlayer, N playouts per move
+#
+## Each line of the record file is one game in the notation of
+## Notation.py, tagged with the white and black engines.
+
+import multiprocessing
+import os
+import random
+import time
+
+import AlphaBeta
+import Bitboard
+import MCTS
+import Moves
+import Notation
+
+
+class RandomPlayer():
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def best_move(self, board):
+
+        moves = Moves.legal_moves(board)
+
+        if not moves:
+            return None
+
+        return self.rng.choice(moves)
+
+
+def make_player(spec, seed=None):
+    """
+    Builds the player described by the configuration string 'spec'.
+    """
+
+    name, _, arg = spec.partition(":")
+
+    if name == "random":
+        return RandomPlayer(seed)
+
+    if name == "alphabeta":
+        return AlphaBeta.AlphaBetaPlayer(max_time=float(arg or 1.0))
+
+    if name == "mcts":
+        # Games already run in parallel : one worker per game
+        return MCTS.MCTSPlayer(playouts=int(arg or 100), workers=1, seed=seed)
+
+    raise ValueError("Unknown engine configuration : " + spec)
+
+
+def play_game(job):
+    """
+    Plays one game. 'job' is (white spec, black spec, max plies, seed).
+    Returns (winner, plies, record), the winner being 0, 1 or None for
+    a draw (both Queens surrounded, or too long), and 'record' the game
+    in notation (see Notation.game_string). A game stopped after
+    'max plies' is recorded as a Draw.
+    """
+
+    specs, max_plies, seed = job[:2], job[2], job[3]
+
+    players = [make_player(spec, seed + k) for k, spec in enumerate(specs)]
+    board   = Bitboard.Bitboard()
+    winner  = None
+
+    while len(board.history) < max_plies:
+
+        lost = (Moves.has_lost(board, 0), Moves.has_lost(board, 1))
+
+        if any(lost):
+            if not all(lost):
+                winner = 1 if lost[0] else 0
+            break
+
+        move = players[board.player].best_move(board)
+        board.make(move)
+
+    return winner, len(board.history), Notation.game_string(board, tags=specs, state=Notation.STATES[winner])
+
+
+def run(games, white, black, output, workers=None, max_plies=300, seed=0):
+    """
+    Plays 'games' games between the configurations 'white' and 'black',
+    which swap colours every other game, and appends them to the file
+    'output' as they end.
+    Returns (games per second, average plies per game).
+    """
+
+    workers = workers or os.cpu_count() or 1
+
+    jobs = []
+    for k in range(games):
+        specs = (white, black) if k % 2 == 0 else (black, white)
+        jobs.append(specs + (max_plies, seed + 2 * k))
+
+    start = time.perf_counter()
+    plies = 0
+
+    with open(output, "a") as record, multiprocessing.Pool(workers) as pool:
+
+        for done, (winner, length, line) in enumerate(pool.imap_unordered(play_game, jobs), 1):
+
+            record.write(line + "\n")
+            record.flush()
+
+            plies += length
+            print("Game %d/%d : %s in %d plies" % (done, games, Notation.STATES[winner], length))
+
+    elapsed = time.perf_counter() - start
+
+    return games / elapsed, plies / max(games, 1)
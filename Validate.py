@@ -0,0 +1,159 @@
+## Checks whole files of recorded games (see Notation.py) against the
+## rules of Moves.place_piece and Moves.play_legal_move.
+## For each game, it reports the first illegal move (or the first move
+## played after the end of the game), and whether the recorded result
+## agrees with Moves.has_lost on the final position. A game stopped
+## before its end may be recorded as a Draw (see SelfPlay.play_game).
+#
+## The file is read lazily, one line at a time, and the games are
+## replayed on a pool of worker processes, so that very large game
+## databases can be checked in one go.
+#
+## Usage :
+#
+#   python Validate.py FILE [FILE ...] [--workers N] [--chunksize N]
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import Bitboard
+import Moves
+import Notation
+
+
+def validate_game(job):
+    """
+    Replays one game. 'job' is (line number, line).
+    Returns (line number, error, recorded state, actual state) :
+    'error' is None if every move is legal, and the recorded state is
+    the one written in the line (see Notation.STATES). No exception
+    is raised, whatever the line holds.
+    """
+
+    number, line = job
+
+    try:
+        tags, recorded, moves = Notation.parse_game(line)
+    except ValueError as e:
+        return number, str(e), None, None
+
+    # Same rules, faster moves (see Bitboard)
+    board = Bitboard.Bitboard()
+    error = None
+    ply   = 0
+
+    try:
+        for board in Notation.replay(moves, board):
+            ply += 1
+
+            if ply < len(moves) and (Moves.has_lost(board, 0) or Moves.has_lost(board, 1)):
+                error = "Move %d : %r is played after the end of the game" % (ply + 1, moves[ply])
+                break
+
+    except ValueError as e:
+        error = str(e)
+
+    # A malformed game must not stop the whole run : anything else
+    # going wrong is reported as the error of this game
+    except Exception as e:
+        error = "Move %d : %s : %s" % (ply + 1, type(e).__name__, e)
+
+    return number, error, recorded, Notation.game_state(board)
+
+
+
+class Report():
+    """
+    Results of a validation run : the illegal games and the games
+    whose recorded result is wrong, by line number.
+    """
+
+    def __init__(self):
+
+        self.games   = 0
+        self.illegal = []     # (line number, error)
+        self.wrong   = []     # (line number, recorded state, actual state)
+        self.elapsed = 0.0
+
+
+    def add(self, number, error, recorded, actual):
+
+        self.games += 1
+
+        if error:
+            self.illegal.append((number, error))
+
+        elif recorded != actual and not (recorded == "Draw" and actual == "InProgress"):
+            self.wrong.append((number, recorded, actual))
+
+
+    def games_per_second(self):
+
+        if self.elapsed:
+            return self.games / self.elapsed
+
+        return 0.0
+
+
+    def summary(self):
+        return ("%d games, %d with an illegal move, %d with a wrong result, in %.2f s (%.0f games/s)"
+                % (self.games, len(self.illegal), len(self.wrong), self.elapsed, self.games_per_second()))
+
+
+
+def validate(lines, workers=None, chunksize=64):
+    """
+    Checks every game of 'lines' (an open file, or any iterable of
+    lines) on 'workers' processes (the number of cores by default).
+    Returns a Report, whose entries are sorted by line number.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    report  = Report()
+    start   = time.perf_counter()
+
+    jobs = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+
+    if workers == 1:
+        for result in map(validate_game, jobs):
+            report.add(*result)
+
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(validate_game, jobs, chunksize):
+                report.add(*result)
+
+    report.illegal.sort()
+    report.wrong.sort()
+    report.elapsed = time.perf_counter() - start
+
+    return report
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Checks files of recorded Hive games.")
+    parser.add_argument("files",       nargs="+")
+    parser.add_argument("--workers",   type=int,              help="number of processes (default : all the cores)")
+    parser.add_argument("--chunksize", type=int, default=64, help="games sent to a process at once")
+
+    args = parser.parse_args()
+
+    for path in args.files:
+
+        with open(path) as f:
+            report = validate(f, args.workers, args.chunksize)
+
+        for number, error in report.illegal:
+            print("%s:%d : %s" % (path, number, error))
+
+        for number, recorded, actual in report.wrong:
+            print("%s:%d : recorded as %s, but the game is %s" % (path, number, recorded, actual))
+
+        print("%s : %s" % (path, report.summary()))
+
+
+if __name__=="__main__":
+    main()
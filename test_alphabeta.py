@@ -0,0 +1,105 @@
+import pytest
+
+import AlphaBeta
+import Bitboard
+import Board
+import Evaluation
+import Moves
+
+
+# White wins by running the Ant of (8, 12) to (11, 16), the last free
+# cell around the Black Queen : it is the only winning move
+mate_in_one = [
+    ('G', None, (9, 14)),
+    ('B', None, (9, 15)),
+    ('B', None, (8, 14)),
+    ('S', None, (10, 16)),
+    ('G', None, (7, 15)),
+    ('A', None, (9, 16)),
+    ('Q', None, (9, 13)),
+    ('Q', None, (10, 15)),
+    ('S', None, (7, 16)),
+    ('A', (9, 16), (11, 15)),
+    ('S', None, (8, 13)),
+    ('A', None, (12, 15)),
+    ('G', None, (8, 16)),
+    ('B', None, (11, 14)),
+    ('G', (8, 16), (6, 16)),
+    ('A', None, (9, 16)),
+    ('B', None, (5, 16)),
+    ('A', (12, 15), (12, 14)),
+    ('A', None, (8, 12)),
+    ('A', (12, 14), (7, 12)),
+    ('Q', (9, 13), (10, 14)),
+    ('A', (7, 12), (5, 17)),
+]
+
+
+def build(board_class):
+
+    board = board_class()
+
+    for move in mate_in_one:
+        board.make(move)
+
+    return board
+
+
+@pytest.mark.parametrize("board_class", [Board.Board, Bitboard.Bitboard])
+def test_mate_in_one(board_class):
+
+    board  = build(board_class)
+    engine = AlphaBeta.AlphaBetaPlayer(max_time=5.0)
+    move   = engine.best_move(board)
+
+    assert move == ('A', (8, 12), (11, 16))
+    assert engine.score == AlphaBeta.WIN - 1
+
+    board.make(move)
+    assert Moves.has_lost(board, 1) and not Moves.has_lost(board, 0)
+
+
+def test_board_untouched():
+
+    board     = build(Board.Board)
+    evaluator = Evaluation.Evaluator(board)
+
+    history   = list(board.history)
+    stacks    = {cell: list(stack) for cell, stack in board.board.items()}
+    observers = list(board.observers)
+    start     = board.hash
+
+    AlphaBeta.AlphaBetaPlayer(max_time=0.5).best_move(board)
+
+    assert board.hash == start
+    assert board.history == history
+    assert board.board == stacks
+    assert board.observers == observers
+    assert evaluator.check()
+
+
+def test_mate_scores_by_ply():
+
+    # The same mating position, searched once one ply from the root and
+    # found again in the table three plies from the root : the win is
+    # one more ply away from the root each time
+    board  = build(Bitboard.Bitboard)
+    engine = AlphaBeta.AlphaBetaPlayer()
+
+    engine.evaluator = Evaluation.Evaluator(board)
+    engine.deadline  = float("inf")
+
+    assert engine.negamax(board, 2, -AlphaBeta.INFINITY, AlphaBeta.INFINITY, 1) == AlphaBeta.WIN - 2
+    assert board.hash in engine.table
+    assert engine.negamax(board, 2, -AlphaBeta.INFINITY, AlphaBeta.INFINITY, 3) == AlphaBeta.WIN - 4
+
+
+def test_table_size():
+
+    board  = build(Bitboard.Bitboard)
+    engine = AlphaBeta.AlphaBetaPlayer(max_time=0.5, max_depth=2, table_size=50)
+
+    board.unmake()
+    engine.best_move(board)
+
+    assert 0 < len(engine.table) <= 50
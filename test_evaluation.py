@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+import Bitboard
+import Board
+import Evaluation
+import Moves
+
+
+@pytest.mark.parametrize("board_class", [Board.Board, Bitboard.Bitboard])
+@pytest.mark.parametrize("weights", [None, {"mobility": 1}])
+def test_incremental_features(board_class, weights):
+
+    rng = random.Random(8)
+
+    for game in range(10):
+
+        board     = board_class()
+        evaluator = Evaluation.Evaluator(board, weights)
+
+        for ply in range(rng.randrange(1, 100)):
+
+            assert evaluator.check(), (game, ply)
+            assert evaluator.evaluate() == Evaluation.evaluate(board, evaluator.weights)
+
+            moves = Moves.legal_moves(board)
+            if not moves:
+                break
+
+            board.make(rng.choice(moves))
+
+            # Taking moves back must restore the counters as well
+            if rng.random() < 0.3:
+                board.unmake()
+
+        # And all the way back to the empty board
+        while board.history:
+            board.unmake()
+            assert evaluator.check(), game
+
+        evaluator.detach()
+        assert board.observers == []
+
+
+def test_partial_weights():
+
+    rng   = random.Random(3)
+    board = Bitboard.Bitboard()
+
+    for ply in range(30):
+        board.make(rng.choice(Moves.legal_moves(board)))
+
+    weights = {"mobility": 1}
+
+    assert Evaluation.evaluate(board, weights) == Evaluation.Evaluator(board, weights).evaluate()
@@ -0,0 +1,101 @@
+import random
+
+import numpy as np
+
+import Bitboard
+import Board
+import Features
+import Moves
+
+
+def random_boards(count, seed):
+
+    rng    = random.Random(seed)
+    boards = []
+
+    for k in range(count):
+
+        board = (Board.Board if k % 2 else Bitboard.Bitboard)()
+
+        for ply in range(rng.randrange(0, 90)):
+            moves = Moves.legal_moves(board)
+            if not moves:
+                break
+            board.make(rng.choice(moves))
+
+        boards.append(board)
+
+    return boards
+
+
+def distance(a, b):
+    """
+    Number of steps between the cells 'a' and 'b', in offset coordinates.
+    """
+
+    (i, j), (x, y) = a, b
+
+    q1, r1 = j, i - (j >> 1)
+    q2, r2 = y, x - (y >> 1)
+
+    return (abs(q1 - q2) + abs(r1 - r2) + abs(q1 + r1 - q2 - r2)) // 2
+
+
+def reference(board):
+    """
+    Row of Features.features for 'board', computed on its own with the
+    methods of the board.
+    """
+
+    row    = []
+    pinned = Moves.pinned_cells(board)
+
+    for colour in range(2):
+
+        row += [len(board.pieces_of(colour, s)) for s in Features.SYMBOLS]
+        row += [board.remaining_pieces[colour][s] for s in Features.SYMBOLS]
+
+        queen = board.queen_position(colour)
+        row  += [1, 6 - len(board.occupied_adjacent_cells(*queen))] if queen else [0, 6]
+
+        mobility = [0] * len(Features.SYMBOLS)
+        if board.queens[colour]:
+            for i, j in board.cells_of_colour(colour):
+                mobility[Features.SYMBOLS.index(board.piece_on(i, j).symbol)] += len(Moves.moves_piece(board, i, j))
+
+        row += mobility
+        row.append(len(board.cells_of_colour(colour) & pinned))
+
+        cells = [p.coords for s in "BSAG" for p in board.pieces_of(colour, s)]
+
+        for target in (colour, 1 - colour):
+            queen = board.queen_position(target)
+            row.append(sum(distance(cell, queen) for cell in cells) / max(len(cells), 1) if queen else 0)
+
+    return row + [board.player]
+
+
+def test_features():
+
+    boards = random_boards(200, 4)
+    matrix = Features.features(boards)
+
+    assert matrix.shape == (len(boards), len(Features.feature_names))
+
+    for k, board in enumerate(boards):
+        expected = np.array(reference(board), dtype=matrix.dtype)
+        wrong    = [name for name, a, b in zip(Features.feature_names, matrix[k], expected) if not np.isclose(a, b)]
+        assert not wrong, (k, wrong)
+
+
+def test_features_without_mobility():
+
+    boards = random_boards(20, 5)
+    full   = Features.features(boards)
+    fast   = Features.features(boards, mobility=False)
+
+    for column, name in enumerate(Features.feature_names):
+        if "mobility" in name or "pinned" in name:
+            assert not fast[:, column].any(), name
+        else:
+            assert np.array_equal(fast[:, column], full[:, column]), name
@@ -0,0 +1,72 @@
+import random
+import threading
+
+import Board
+import MCTS
+import Moves
+
+
+class Watcher():
+    """
+    Observer which cannot be pickled, like a BoardUI.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def on_add(self, x, y, p):
+        pass
+
+    def on_remove(self, x, y, p):
+        pass
+
+
+def midgame(seed):
+
+    rng   = random.Random(seed)
+    board = Board.Board()
+
+    for ply in range(12):
+        board.make(rng.choice(Moves.legal_moves(board)))
+
+    return board
+
+
+def test_single_worker():
+
+    board = midgame(1)
+    moves = Moves.legal_moves(board)
+
+    results = []
+
+    for run in range(2):
+        player = MCTS.MCTSPlayer(playouts=40, workers=1, max_plies=20, seed=5)
+        move   = player.best_move(board)
+
+        assert move in moves
+        assert set(player.visits) <= set(moves)
+        assert player.total_playouts == 40
+
+        results.append((move, player.visits))
+
+    # Same seed, same search
+    assert results[0] == results[1]
+
+
+def test_pool():
+
+    board = midgame(2)
+    start = board.hash
+
+    board.observers.append(Watcher())
+
+    player = MCTS.MCTSPlayer(playouts=20, workers=2, max_plies=20, seed=5)
+
+    try:
+        move = player.best_move(board)
+    finally:
+        player.close()
+
+    assert move in Moves.legal_moves(board)
+    assert player.total_playouts == 20
+    assert board.hash == start
@@ -0,0 +1,103 @@
+import random
+
+import Board
+import Moves
+import Notation
+import Perft
+
+
+def played(moves):
+
+    board = Board.Board()
+
+    for move in moves:
+        yield board, move
+        board.make(move)
+
+
+def test_eviction():
+
+    cache = Moves.MoveCache(capacity=2)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    # "a" was used last, so "b" is evicted first
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_counters():
+
+    cache = Moves.MoveCache()
+
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("a") == 1
+
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache.hit_rate() == 2 / 3
+
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+
+def test_cached_legal_moves():
+
+    cache = Moves.MoveCache()
+    board = Perft.build("midgame")
+    moves = Moves.legal_moves(board)
+
+    assert Moves.cached_legal_moves(board, cache) == moves
+    assert Moves.cached_legal_moves(board, cache) == moves
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # The list returned belongs to the caller
+    Moves.cached_legal_moves(board, cache).clear()
+    assert Moves.cached_legal_moves(board, cache) == moves
+
+
+def test_mutation():
+
+    cache = Moves.MoveCache()
+    board = Perft.build("midgame")
+    rng   = random.Random(4)
+
+    for ply in range(20):
+
+        # A new position has a new hash : it is never answered with
+        # the moves of the previous one
+        misses = cache.misses
+        assert Moves.cached_legal_moves(board, cache) == Moves.legal_moves(board)
+        assert cache.misses == misses + 1
+
+        for cell in board.board:
+            if board.piece_on(*cell).colour == board.player:
+                assert Moves.cached_moves_piece(board, *cell, cache=cache) == set(Moves.moves_piece(board, *cell))
+
+        board.make(rng.choice(Moves.legal_moves(board)))
+
+    # And the position is found again once the moves are taken back
+    while len(board.history) > len(Perft.positions["midgame"]):
+        board.unmake()
+
+    hits = cache.hits
+    assert Moves.cached_legal_moves(board, cache) == Moves.legal_moves(board)
+    assert cache.hits == hits + 1
+
+
+def test_replay_bypasses_cache():
+
+    Moves.move_cache.clear()
+
+    moves = [Notation.move_to_string(board, move) for board, move in played(Perft.positions["midgame"])]
+    for board in Notation.replay(moves):
+        pass
+
+    assert len(Moves.move_cache) == 0
@@ -0,0 +1,82 @@
+import io
+import random
+
+import pytest
+
+import Board
+import Moves
+import Notation
+
+
+def random_game(seed):
+    """
+    Plays random legal moves on a new Board until a Beetle climbed on
+    the hive and a player had to pass, and plays a few more moves.
+    """
+
+    rng   = random.Random(seed)
+    board = Board.Board()
+
+    climbed = passed = False
+
+    while not (climbed and passed) or len(board.history) < passed + 4:
+
+        moves = Moves.legal_moves(board)
+        assert moves, "the game ended too early"
+
+        move = rng.choice(moves)
+        board.make(move)
+
+        if move == Moves.PASS:
+            passed = passed or len(board.history)
+
+        elif board.piece_on(*move[2]).height:
+            climbed = True
+
+    return board
+
+
+def names(board):
+    return {cell: [Notation.piece_name(p) for p in stack] for cell, stack in board.board.items()}
+
+
+@pytest.mark.parametrize("seed", [276, 183])
+def test_round_trip(seed):
+
+    board = random_game(seed)
+    line  = Notation.game_string(board, tags=("white", "black"))
+
+    assert "pass" in line.split(";")
+
+    (tags, state, moves), = Notation.read_games(io.StringIO("\n" + line + "\n"))
+
+    assert tags == ["white", "black"]
+    assert state == Notation.game_state(board)
+    assert len(moves) == len(board.history)
+
+    for replayed in Notation.replay(moves):
+        pass
+
+    assert replayed.hash == board.hash
+    assert names(replayed) == names(board)
+    assert Notation.game_string(replayed, tags=tags) == line
+
+
+def test_illegal_move():
+
+    with pytest.raises(ValueError, match="Illegal move 3"):
+        list(Notation.replay(["wS1", "bG1 -wS1", "wA1 -bG1"]))
+
+
+@pytest.mark.parametrize("moves, error", [
+    (["wS1", "bG1 -"],                  "Not a piece : ''"),
+    (["wQ", "bQ -wQ", "wA1 wQx-"],      "Not a piece : 'wQx'"),
+    (["wS1", "bG1 -wS1", "wA0 /wS1"],   "Not a piece : 'wA0'"),
+    (["wS1", "bG1 -wS1", "wQ1 /wS1"],   "Not a piece : 'wQ1'"),
+    (["wS1", "bX1 -wS1"],               "Not a piece : 'bX1'"),
+    (["wS1", "bG1 -wS1", "wA3 -bG1"],   "wA3 is placed before wA1"),
+])
+def test_unreadable_move(moves, error):
+
+    with pytest.raises(ValueError, match="Move %d : %s" % (len(moves), error)):
+        list(Notation.replay(moves))
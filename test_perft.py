@@ -0,0 +1,35 @@
+import pytest
+
+import Bitboard
+import Board
+import Perft
+
+
+# Known leaf node counts of the reference positions, by depth
+known_nodes = {
+    "opening": {1: 5,  2: 150,  3: 2220,   4: 32856},
+    "midgame": {1: 70, 2: 4195, 3: 295469},
+    "ants":    {1: 78, 2: 4027, 3: 244395},
+    "beetles": {1: 39, 2: 3010, 3: 143660},
+}
+
+
+@pytest.mark.parametrize("name", sorted(known_nodes))
+def test_perft_board(name):
+
+    board = Perft.build(name, Board.Board)
+    start = board.hash
+
+    for depth in (1, 2):
+        assert Perft.perft(board, depth) == known_nodes[name][depth]
+
+    assert board.hash == start
+
+
+@pytest.mark.parametrize("name", sorted(known_nodes))
+def test_perft_bitboard(name):
+
+    board = Perft.build(name, Bitboard.Bitboard)
+
+    for depth, nodes in known_nodes[name].items():
+        assert Perft.perft(board, depth) == nodes
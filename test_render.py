@@ -7,15 +7,15 @@ import Moves
 b = Board.Board()
 ui = BoardUI.BoardUI(b)
 
-b.board[10][10].append(Pieces.Spider())
-b.board[11][10].append(Pieces.Ant(1))
-b.board[12][10].append(Pieces.Queen(1))
-b.board[10][11].append(Pieces.Beetle(1))
-b.board[11][11].append(Pieces.Spider(1))
-b.board[12][11].append(Pieces.Beetle(0))
-b.board[10][12].append(Pieces.Grasshopper(0))
-b.board[11][12].append(Pieces.Grasshopper(1))
-b.board[11][13].append(Pieces.Queen(0))
+b.add_piece(10, 10, Pieces.Spider())
+b.add_piece(11, 10, Pieces.Ant(1))
+b.add_piece(12, 10, Pieces.Queen(1))
+b.add_piece(10, 11, Pieces.Beetle(1))
+b.add_piece(11, 11, Pieces.Spider(1))
+b.add_piece(12, 11, Pieces.Beetle(0))
+b.add_piece(10, 12, Pieces.Grasshopper(0))
+b.add_piece(11, 12, Pieces.Grasshopper(1))
+b.add_piece(11, 13, Pieces.Queen(0))
 
 b.white_queen = True
 b.black_queen = True
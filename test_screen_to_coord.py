@@ -0,0 +1,32 @@
+import math
+
+import pytest
+
+BoardUI = pytest.importorskip("BoardUI")
+
+
+cells = [(i, j) for i in range(-5, 51) for j in range(-5, 51)]
+
+
+@pytest.mark.parametrize("radius, offset", [(26, [0, 0]), (26, [-130, 75]), (10, [13, -200]), (40, [0, 0])])
+def test_round_trip(radius, offset):
+
+    for i, j in cells:
+        x, y = BoardUI.coord_to_screen(i, j, radius, offset)
+        assert BoardUI.screen_to_coord(x, y, radius, offset) == (i, j)
+
+
+@pytest.mark.parametrize("radius, offset", [(26, [0, 0]), (10, [13, -200])])
+def test_inside_hexagon(radius, offset):
+
+    # Points close to the border of the drawn hexagon still belong to its cell
+
+    for i, j in cells:
+        x, y = BoardUI.coord_to_screen(i, j, radius, offset)
+
+        for k in range(12):
+            angle = 2 * math.pi * k / 12
+            scale = 0.98 * radius if k % 2 == 0 else 0.98 * radius * math.sqrt(3) / 2
+
+            point = (x + scale * math.cos(angle), y + scale * math.sin(angle))
+            assert BoardUI.screen_to_coord(point[0], point[1], radius, offset) == (i, j)
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+import Board
+import Moves
+import Notation
+import Validate
+
+
+def random_game(seed, plies):
+
+    rng   = random.Random(seed)
+    board = Board.Board()
+
+    for ply in range(plies):
+        moves = Moves.legal_moves(board)
+        if not moves:
+            break
+        board.make(rng.choice(moves))
+
+    return board
+
+
+def test_report():
+
+    report = Validate.Report()
+
+    report.add(1, None, "InProgress", "InProgress")
+    report.add(2, None, "Draw", "InProgress")          # Stopped before its end
+    report.add(3, None, "WhiteWins", "InProgress")
+    report.add(4, None, "InProgress", "Draw")
+    report.add(5, "Illegal move 3 : 'wA1 -bG1'", "InProgress", "InProgress")
+
+    assert report.games == 5
+    assert report.wrong == [(3, "WhiteWins", "InProgress"), (4, "InProgress", "Draw")]
+    assert report.illegal == [(5, "Illegal move 3 : 'wA1 -bG1'")]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate(workers):
+
+    board = random_game(1, 30)
+    game  = Notation.game_string(board)
+    state = Notation.game_state(board)
+
+    lines = [game,
+             Notation.game_string(board, state="Draw"),
+             game.replace(state, "BlackWins"),
+             "",
+             "Base;InProgress;White[1];wS1;bG1 -",
+             "Base;InProgress;White[2];wS1;bG1 -wS1;wA1 -bG1",
+             "not a game"]
+
+    report = Validate.validate(lines, workers=workers, chunksize=1)
+
+    assert report.games == 6
+    assert report.wrong == [(3, "BlackWins", state)]
+    assert [number for number, error in report.illegal] == [5, 6, 7]
+    assert "Not a piece" in report.illegal[0][1]
+
+
+def test_unexpected_error(monkeypatch):
+
+    def replay(moves, board=None):
+        yield board
+        raise KeyError("oops")
+
+    monkeypatch.setattr(Notation, "replay", replay)
+
+    number, error, recorded, actual = Validate.validate_game((7, "Base;InProgress;White[1];wS1;bG1 -wS1"))
+
+    assert number == 7
+    assert error == "Move 2 : KeyError : 'oops'"